@@ -1,4 +1,5 @@
 #include <WiFi.h>
+#include <ESP32Servo.h>
 #include "PubSubClient.h"
 
 // New motor pin assignments
@@ -10,6 +11,11 @@
 #define motorLeftPin2 25 // Left motor pin 2
 #define enableLeftPin 32 // Left motor enable pin
 
+#define gripperPin 13 // Gripper servo signal pin
+#define gripperOpenAngle 90
+#define gripperClosedAngle 10
+#define gripperMoveMs 600 // Time for the servo to reach its target angle
+
 int left_min_pwm_forward = 110;
 int left_min_pwm_backward = 115;
 int right_min_pwm_forward = 110;
@@ -17,6 +23,11 @@ int right_min_pwm_backward = 115;
 
 WiFiClient espClient22;
 PubSubClient client(espClient22);
+Servo gripper;
+
+// Gripper state to report once the servo has finished moving
+const char* gripperPendingState = NULL;
+unsigned long gripperDoneAt = 0;
 
 // Replace with your network credentials (STATION)
 const char* ssid = "Redmi";
@@ -49,9 +60,18 @@ void setup() {
   pinMode(motorLeftPin1, OUTPUT);
   pinMode(motorLeftPin2, OUTPUT);
   pinMode(enableLeftPin, OUTPUT);
+
+  gripper.attach(gripperPin);
+  gripper.write(gripperOpenAngle);
 }
 
 void callback(String topic, byte* message, unsigned int length) {
+  // Echo link probes straight back before doing anything slow
+  if(topic == "/robot6_ping"){
+      client.publish("/robot6_pong", message, length);
+      return;
+  }
+
   Serial.print("Message arrived on topic: ");
   Serial.print(topic);
   Serial.print(". Message: ");
@@ -103,6 +123,18 @@ void callback(String topic, byte* message, unsigned int length) {
       Serial.print("robot6_right_backward : ");
       Serial.println(pwm_value);
   }
+  if(topic == "/robot6_gripper_close"){
+      gripper.write(gripperClosedAngle);
+      gripperPendingState = "closed";
+      gripperDoneAt = millis() + gripperMoveMs;
+      Serial.println("robot6_gripper_close");
+  }
+  if(topic == "/robot6_gripper_open"){
+      gripper.write(gripperOpenAngle);
+      gripperPendingState = "open";
+      gripperDoneAt = millis() + gripperMoveMs;
+      Serial.println("robot6_gripper_open");
+  }
   Serial.println();
 }
 
@@ -115,6 +147,9 @@ void reconnect() {
       client.subscribe("/robot6_right_forward");
       client.subscribe("/robot6_left_backward");
       client.subscribe("/robot6_right_backward");
+      client.subscribe("/robot6_gripper_close");
+      client.subscribe("/robot6_gripper_open");
+      client.subscribe("/robot6_ping");
     } else {
       Serial.print("failed, rc=");
       Serial.print(client.state());
@@ -135,5 +170,10 @@ void loop() {
   if(!client.loop()){
     client.connect("ESP32Client21");
   }
+  // Acknowledge the gripper command once the servo has had time to move
+  if(gripperPendingState != NULL && (long)(millis() - gripperDoneAt) >= 0){
+    client.publish("/robot6_gripper_status", gripperPendingState);
+    gripperPendingState = NULL;
+  }
   delay(100);
 }
@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+
+def start_echo(broker, port, robot_ids):
+    """Stand in for the robots by echoing every ping back on its pong topic."""
+
+    def on_connect(client, userdata, flags, rc):
+        for robot_id in robot_ids:
+            client.subscribe(f"/robot{robot_id}_ping")
+
+    def on_message(client, userdata, msg):
+        client.publish(msg.topic.replace("_ping", "_pong"), msg.payload)
+
+    echo = mqtt.Client()
+    echo.on_connect = on_connect
+    echo.on_message = on_message
+    echo.connect(broker, port, 60)
+    echo.loop_start()
+    return echo
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure MQTT round-trip latency and link health to each robot."
+    )
+    parser.add_argument("--broker", default=main.MQTT_BROKER)
+    parser.add_argument("--port", type=int, default=main.MQTT_PORT)
+    parser.add_argument(
+        "--echo",
+        action="store_true",
+        help="answer pings locally instead of waiting for the robots",
+    )
+    parser.add_argument("--interval", type=float, default=main.LINK_PING_INTERVAL)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main.MQTT_BROKER = args.broker
+    main.MQTT_PORT = args.port
+    main.LINK_PING_INTERVAL = args.interval
+
+    if args.echo:
+        start_echo(args.broker, args.port, main.ROBOT_IDS)
+    main.connect_mqtt()
+
+    threading.Thread(target=main.link_monitor_loop, daemon=True).start()
+    time.sleep(args.duration)
+
+    for robot_id in main.ROBOT_IDS:
+        health = main.get_link_health(robot_id)
+        print(f"Robot {robot_id}:")
+        for name, value in health.items():
+            if name.startswith("rtt_") and value is not None:
+                print(f"  {name}: {value * 1000:.2f} ms")
+            else:
+                print(f"  {name}: {value}")
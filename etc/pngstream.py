@@ -1,17 +1,235 @@
 #! /usr/bin/env python
 
+import argparse
+import math
+import os
+import threading
+import time
+
 from flask import Flask, Response
 import cv2
+import numpy as np
 
 app = Flask(__name__)
 
+ETC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Named resolutions accepted by --resolution (anything else must be WIDTHxHEIGHT)
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# Marker layout of the synthetic arena, kept in sync with main.py
+CORNER_MARKERS = [0, 1, 2, 3]
+DROP_OFF_IDS = [4, 5]
+ROBOT_IDS = [6]
+WASTE_IDS = [7, 8, 9, 10]
+
+aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_6X6_250)
+marker_images = {}  # (marker_id, size) -> bordered BGR marker image
+
+# Pre-encoded JPEG frames shared by every client, filled in by prepare_frames()
+stream = {"frames": [], "fps": 30.0, "clients": 0}
+stream_lock = threading.Lock()
+
+
+def parse_resolution(value):
+    """Parse a named resolution or a WIDTHxHEIGHT string into (width, height)."""
+    if value is None:
+        return None
+    if value.lower() in RESOLUTIONS:
+        return RESOLUTIONS[value.lower()]
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Resolution must be one of {sorted(RESOLUTIONS)} or WIDTHxHEIGHT."
+        )
+    return width, height
+
+
+def load_image_frames(path, resolution):
+    """Load a still image as a single frame."""
+    img = cv2.imread(path)
+    if img is None:
+        raise FileNotFoundError(f"Could not read image {path}")
+    if resolution:
+        img = cv2.resize(img, resolution, interpolation=cv2.INTER_AREA)
+    return [img]
+
+
+def load_video_frames(path, resolution, max_frames=None):
+    """Decode a video file frame by frame, resized to the requested resolution."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video {path}")
+
+    decoded = 0
+    try:
+        while max_frames is None or decoded < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if resolution:
+                frame = cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA)
+            decoded += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def draw_marker(canvas, marker_id, center, size, angle):
+    """Paste a rotated ArUco marker (with its white quiet zone) onto the canvas."""
+    key = (marker_id, size)
+    if key not in marker_images:
+        border = size // 4
+        marker = cv2.aruco.generateImageMarker(aruco_dict, marker_id, size)
+        marker = cv2.copyMakeBorder(
+            marker, border, border, border, border, cv2.BORDER_CONSTANT, value=255
+        )
+        marker_images[key] = cv2.cvtColor(marker, cv2.COLOR_GRAY2BGR)
+    marker = marker_images[key]
+
+    # Map the marker corners to their rotated positions around the center
+    half = marker.shape[0] / 2
+    c, s = math.cos(angle), math.sin(angle)
+    src = np.float32([[0, 0], [2 * half, 0], [2 * half, 2 * half], [0, 2 * half]])
+    dst = np.float32(
+        [
+            [center[0] + c * dx - s * dy, center[1] + s * dx + c * dy]
+            for dx, dy in ((-half, -half), (half, -half), (half, half), (-half, half))
+        ]
+    )
+
+    # Warp only into the marker's bounding box, not the whole canvas
+    height, width = canvas.shape[:2]
+    x0, y0 = np.maximum(np.floor(dst.min(axis=0)).astype(int), 0)
+    x1, y1 = np.minimum(np.ceil(dst.max(axis=0)).astype(int) + 1, (width, height))
+    if x1 <= x0 or y1 <= y0:
+        return
+    matrix = cv2.getPerspectiveTransform(src, dst - np.float32([x0, y0]))
+    warped = cv2.warpPerspective(marker, matrix, (x1 - x0, y1 - y0))
+    mask = cv2.warpPerspective(
+        np.full(marker.shape[:2], 255, np.uint8), matrix, (x1 - x0, y1 - y0)
+    )
+    roi = canvas[y0:y1, x0:x1]
+    roi[mask > 0] = warped[mask > 0]
+
+
+def render_aruco_frame(resolution, t, loop_seconds):
+    """Render the synthetic arena at time t, with markers moving on closed loops."""
+    width, height = resolution
+    canvas = np.full((height, width, 3), 90, np.uint8)
+
+    size = max(24, min(width, height) // 12)
+    margin = size
+    phase = 2 * math.pi * t / loop_seconds
+
+    # Corner markers pin the arena, drop-offs sit along the left and right edges
+    corners = [
+        (width - margin, height - margin),
+        (width - margin, margin),
+        (margin, margin),
+        (margin, height - margin),
+    ]
+    for marker_id, center in zip(CORNER_MARKERS, corners):
+        draw_marker(canvas, marker_id, center, size, 0)
+    for marker_id, center in zip(
+        DROP_OFF_IDS, [(2 * margin, height // 2), (width - 2 * margin, height // 2)]
+    ):
+        draw_marker(canvas, marker_id, center, size, 0)
+
+    # Robots drive around an ellipse, heading along the direction of travel
+    cx, cy = width / 2, height / 2
+    rx, ry = width / 4, height / 4
+    for i, marker_id in enumerate(ROBOT_IDS):
+        a = phase + 2 * math.pi * i / len(ROBOT_IDS)
+        center = (cx + rx * math.cos(a), cy + ry * math.sin(a))
+        heading = math.atan2(ry * math.cos(a), -rx * math.sin(a))
+        draw_marker(canvas, marker_id, center, size, heading + math.pi / 2)
+
+    # Waste drifts slowly around its spot so detection never sees a static scene
+    for i, marker_id in enumerate(WASTE_IDS):
+        a = 2 * math.pi * i / len(WASTE_IDS)
+        center = (
+            cx + 0.6 * rx * math.cos(a) + 0.05 * rx * math.cos(phase + a),
+            cy + 0.6 * ry * math.sin(a) + 0.05 * ry * math.sin(phase + a),
+        )
+        draw_marker(canvas, marker_id, center, size, 0.25 * math.sin(phase + a))
+
+    return canvas
+
+
+def render_aruco_frames(resolution, fps, loop_seconds):
+    """Render one full motion loop so the stream can repeat it seamlessly."""
+    count = max(1, int(round(fps * loop_seconds)))
+    for i in range(count):
+        yield render_aruco_frame(resolution, i / fps, loop_seconds)
+
+
+def encode_frames(frames, quality):
+    """
+    JPEG-encode every frame once, up front, so serving costs no CPU per client.
+    Frames are encoded as they arrive and only the JPEG bytes are kept.
+    Returns (encoded frames, (width, height) of the first frame).
+    """
+    encoded = []
+    size = None
+    for frame in frames:
+        if size is None:
+            size = (frame.shape[1], frame.shape[0])
+        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        encoded.append(
+            b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n"
+        )
+    return encoded, size
+
+
+def prepare_frames(source, resolution, fps, quality, loop_seconds, max_frames):
+    """Build and pre-encode the frames for the requested source."""
+    if source == "aruco":
+        frames = render_aruco_frames(resolution or RESOLUTIONS["720p"], fps, loop_seconds)
+    elif os.path.splitext(source)[1].lower() in (".png", ".jpg", ".jpeg", ".bmp"):
+        frames = load_image_frames(source, resolution)
+    else:
+        frames = load_video_frames(source, resolution, max_frames)
+
+    encoded, size = encode_frames(frames, quality)
+    if not encoded:
+        raise ValueError(f"No frames decoded from {source}")
+    with stream_lock:
+        stream["frames"] = encoded
+        stream["fps"] = fps
+    print(f"Prepared {len(encoded)} frames at {size[0]}x{size[1]}, serving at {fps} fps")
+
 
 def generate_frames():
-    img = cv2.imread("sample.png")  # Replace with your image path
-    _, buffer = cv2.imencode(".jpg", img)
-    frame = buffer.tobytes()
-    while True:
-        yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
+    """Yield frames at the configured rate, dropping frames if the client falls behind."""
+    with stream_lock:
+        frames = stream["frames"]
+        period = 1.0 / stream["fps"]
+        stream["clients"] += 1
+        print(f"Client connected ({stream['clients']} active)")
+
+    start = time.monotonic()
+    last_index = -1
+    try:
+        while True:
+            # Index by wall-clock time like a real camera, not by frames sent
+            elapsed = time.monotonic() - start
+            index = int(elapsed / period)
+            if index == last_index:
+                time.sleep((index + 1) * period - elapsed)
+                continue
+            last_index = index
+            yield frames[index % len(frames)]
+    finally:
+        with stream_lock:
+            stream["clients"] -= 1
+            print(f"Client disconnected ({stream['clients']} active)")
 
 
 @app.route("/video_feed")
@@ -21,5 +239,45 @@ def video_feed():
     )
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Synthetic MJPEG camera for load-testing the capture and detection path."
+    )
+    parser.add_argument(
+        "--source",
+        default=os.path.join(ETC_DIR, "sample.png"),
+        help="image or video path, or 'aruco' for procedurally rendered markers",
+    )
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument(
+        "--resolution",
+        type=parse_resolution,
+        default=None,
+        help="480p, 720p, 1080p, 4k or WIDTHxHEIGHT (default: source size)",
+    )
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument(
+        "--loop-seconds",
+        type=float,
+        default=4.0,
+        help="length of the rendered motion loop for --source aruco",
+    )
+    parser.add_argument(
+        "--max-frames", type=int, default=None, help="cap on decoded video frames"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    args = parse_args()
+    prepare_frames(
+        args.source,
+        args.resolution,
+        args.fps,
+        args.quality,
+        args.loop_seconds,
+        args.max_frames,
+    )
+    app.run(host=args.host, port=args.port, threaded=True)
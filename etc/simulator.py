@@ -0,0 +1,410 @@
+#! /usr/bin/env python
+
+import argparse
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from flask import Flask, Response, jsonify
+import cv2
+import numpy as np
+import paho.mqtt.client as mqtt
+
+import pngstream
+
+# Reuse the marker layout and topic conventions of the controller
+sys.path.insert(0, os.path.dirname(pngstream.ETC_DIR))
+from main import (  # noqa: E402
+    CORNER_MARKERS,
+    INORGANIC_DROP_OFF_ID,
+    INORGANIC_WASTE_ID,
+    MQTT_PORT,
+    ORGANIC_DROP_OFF_ID,
+    ORGANIC_WASTE_ID,
+    ROBOT_IDS,
+)
+
+app = Flask(__name__)
+
+WHEEL_TOPIC = re.compile(r"^/robot(\d+)_(left|right)_(forward|backward)$")
+GRIPPER_TOPIC = re.compile(r"^/robot(\d+)_gripper_(open|close)$")
+PING_TOPIC = re.compile(r"^/robot(\d+)_ping$")
+
+# Minimum PWM the firmware maps every non-zero command onto (see esp32.ino)
+MIN_PWM = 110
+
+# Simulated world, advanced by physics_loop() and drawn by camera_loop()
+world = {
+    "time": 0.0,
+    "size": 720,
+    "marker_size": 60,
+    "corners": {},
+    "drop_offs": {},
+    "robots": {},
+    "waste": {},
+    "delivered": [],
+    "commands": 0,
+}
+world_lock = threading.Lock()
+
+# Encoded frames waiting out the simulated camera latency
+camera = {"frames": deque(), "latest": None, "sequence": 0, "fps": 30.0}
+camera_lock = threading.Condition()
+
+
+def drop_off_for(waste_id):
+    """Return the drop-off marker a waste marker must be delivered to."""
+    if waste_id in ORGANIC_WASTE_ID:
+        return ORGANIC_DROP_OFF_ID
+    return INORGANIC_DROP_OFF_ID
+
+
+def wheel_speed(value, max_speed):
+    """Convert an MQTT PWM command into a wheel speed in pixels per second."""
+    pwm = min(abs(value), 255)
+    if pwm == 0:
+        return 0.0
+    # Mirror the firmware's map() onto the motors' usable PWM range
+    pwm = MIN_PWM + (255 - MIN_PWM) * pwm / 255
+    return max_speed * pwm / 255
+
+
+def head_position(robot):
+    """Return the point the controller tracks as the robot's head."""
+    reach = world["marker_size"]
+    return (
+        robot["x"] + reach * math.cos(robot["heading"]),
+        robot["y"] + reach * math.sin(robot["heading"]),
+    )
+
+
+def setup_world(size, seed):
+    """Place corner markers, drop-offs, robots and waste in a fresh arena."""
+    rng = random.Random(seed)
+    marker_size = max(24, size // 12)
+    margin = marker_size
+
+    world["size"] = size
+    world["marker_size"] = marker_size
+    world["corners"] = dict(
+        zip(
+            sorted(CORNER_MARKERS),
+            [
+                (size - margin, size - margin),
+                (size - margin, margin),
+                (margin, margin),
+                (margin, size - margin),
+            ],
+        )
+    )
+    world["drop_offs"] = {
+        INORGANIC_DROP_OFF_ID: (3 * margin, size // 2),
+        ORGANIC_DROP_OFF_ID: (size - 3 * margin, size // 2),
+    }
+    world["robots"] = {
+        robot_id: {
+            "x": size * (i + 1) / (len(ROBOT_IDS) + 1),
+            "y": size - 3 * margin,
+            "heading": -math.pi / 2,
+            "left": 0.0,
+            "right": 0.0,
+            "holding": None,
+        }
+        for i, robot_id in enumerate(ROBOT_IDS)
+    }
+
+    # Scatter waste away from everything else so no two markers overlap
+    taken = list(world["corners"].values()) + list(world["drop_offs"].values())
+    taken += [(robot["x"], robot["y"]) for robot in world["robots"].values()]
+    world["waste"] = {}
+    for waste_id in INORGANIC_WASTE_ID + ORGANIC_WASTE_ID:
+        for _ in range(1000):
+            position = (
+                rng.uniform(2 * margin, size - 2 * margin),
+                rng.uniform(2 * margin, size - 4 * margin),
+            )
+            if all(math.dist(position, other) > 2 * marker_size for other in taken):
+                break
+        else:
+            raise ValueError(f"Arena of size {size} is too small to place all waste.")
+        taken.append(position)
+        world["waste"][waste_id] = {
+            "position": position,
+            "angle": rng.uniform(-0.3, 0.3),
+        }
+
+    world["time"] = 0.0
+    world["delivered"] = []
+    world["commands"] = 0
+
+
+def on_message(client, userdata, msg):
+    # Echo link probes straight back, like the firmware does
+    if PING_TOPIC.match(msg.topic):
+        client.publish(msg.topic.replace("_ping", "_pong"), msg.payload)
+        return
+
+    try:
+        value = float(msg.payload.decode())
+    except ValueError:
+        return
+
+    with world_lock:
+        world["commands"] += 1
+
+        match = WHEEL_TOPIC.match(msg.topic)
+        if match:
+            robot = world["robots"].get(int(match.group(1)))
+            if robot is not None:
+                speed = wheel_speed(value, userdata["max_speed"])
+                robot[match.group(2)] = speed if match.group(3) == "forward" else -speed
+            return
+
+        match = GRIPPER_TOPIC.match(msg.topic)
+        if match:
+            robot_id = int(match.group(1))
+            robot = world["robots"].get(robot_id)
+            if robot is not None:
+                actuate_gripper(robot, match.group(2))
+                # Acknowledge once the simulated gripper has finished moving
+                state = "closed" if match.group(2) == "close" else "open"
+                threading.Timer(
+                    userdata["gripper_time"],
+                    client.publish,
+                    args=(f"/robot{robot_id}_gripper_status", state),
+                ).start()
+
+
+def actuate_gripper(robot, action):
+    """Grab the waste in front of the robot, or release what it is holding."""
+    head = head_position(robot)
+    reach = 1.5 * world["marker_size"]
+
+    if action == "close" and robot["holding"] is None:
+        candidates = [
+            (math.dist(head, waste["position"]), waste_id)
+            for waste_id, waste in world["waste"].items()
+            if not waste.get("held")
+        ]
+        if candidates:
+            distance, waste_id = min(candidates)
+            if distance < reach:
+                robot["holding"] = waste_id
+                world["waste"][waste_id]["held"] = True
+        return
+
+    if action == "open" and robot["holding"] is not None:
+        waste_id = robot["holding"]
+        robot["holding"] = None
+        drop_off = world["drop_offs"][drop_off_for(waste_id)]
+        if math.dist(head, drop_off) < 2 * world["marker_size"]:
+            del world["waste"][waste_id]
+            world["delivered"].append((world["time"], waste_id))
+            print(f"[{world['time']:7.1f}s] waste {waste_id} delivered")
+        else:
+            world["waste"][waste_id] = {"position": head, "angle": 0.0}
+
+
+def step(dt, wheel_base):
+    """Advance every differential-drive robot by dt simulated seconds."""
+    size = world["size"]
+    margin = world["marker_size"] / 2
+    for robot in world["robots"].values():
+        v = (robot["left"] + robot["right"]) / 2
+        omega = (robot["left"] - robot["right"]) / wheel_base
+        robot["heading"] = (robot["heading"] + omega * dt) % (2 * math.pi)
+        x = robot["x"] + v * math.cos(robot["heading"]) * dt
+        y = robot["y"] + v * math.sin(robot["heading"]) * dt
+        robot["x"] = min(max(x, margin), size - margin)
+        robot["y"] = min(max(y, margin), size - margin)
+    world["time"] += dt
+
+
+def physics_loop(rate, wheel_base):
+    # Real time only: the controller, pose filter and gripper timeouts in
+    # main.py all run on wall-clock time
+    tick = 1.0 / rate
+    next_tick = time.monotonic()
+    while True:
+        with world_lock:
+            step(tick, wheel_base)
+        next_tick += tick
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+
+def render_world():
+    """Draw the current world state as a camera frame."""
+    size = world["size"]
+    marker_size = world["marker_size"]
+    canvas = np.full((size, size, 3), 90, np.uint8)
+
+    for marker_id, center in world["corners"].items():
+        pngstream.draw_marker(canvas, marker_id, center, marker_size, 0)
+    for marker_id, center in world["drop_offs"].items():
+        pngstream.draw_marker(canvas, marker_id, center, marker_size, 0)
+    # Held waste is inside the gripper and out of the camera's view
+    for waste_id, waste in world["waste"].items():
+        if not waste.get("held"):
+            pngstream.draw_marker(
+                canvas, waste_id, waste["position"], marker_size, waste["angle"]
+            )
+    # The marker's top edge faces the direction of travel
+    for robot_id, robot in world["robots"].items():
+        pngstream.draw_marker(
+            canvas,
+            robot_id,
+            (robot["x"], robot["y"]),
+            marker_size,
+            robot["heading"] + math.pi / 2,
+        )
+    return canvas
+
+
+def camera_loop(fps, latency, quality):
+    period = 1.0 / fps
+    next_frame = time.monotonic()
+    while True:
+        with world_lock:
+            frame = render_world()
+        _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        captured = time.monotonic()
+
+        with camera_lock:
+            camera["frames"].append((captured, buffer.tobytes()))
+            # Release frames to clients only once they are `latency` seconds old
+            while camera["frames"] and camera["frames"][0][0] <= captured - latency:
+                camera["latest"] = camera["frames"].popleft()[1]
+                camera["sequence"] += 1
+            camera_lock.notify_all()
+
+        next_frame += period
+        time.sleep(max(0.0, next_frame - time.monotonic()))
+
+
+def generate_frames():
+    sequence = 0  # Nothing has been released until the first frame is `latency` old
+    while True:
+        with camera_lock:
+            camera_lock.wait_for(lambda: camera["sequence"] != sequence)
+            sequence = camera["sequence"]
+            frame = camera["latest"]
+        yield (b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n")
+
+
+def get_stats():
+    with world_lock:
+        sim_time = world["time"]
+        delivered = len(world["delivered"])
+        remaining = len(world["waste"])
+        commands = world["commands"]
+    return {
+        "sim_seconds": sim_time,
+        "delivered": delivered,
+        "remaining": remaining,
+        "mqtt_commands": commands,
+        "tasks_per_minute": 60.0 * delivered / sim_time if sim_time else 0.0,
+    }
+
+
+@app.route("/video_feed")
+def video_feed():
+    return Response(
+        generate_frames(), mimetype="multipart/x-mixed-replace; boundary=frame"
+    )
+
+
+@app.route("/stats")
+def stats():
+    return jsonify(get_stats())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Simulated arena that drives virtual robots from the controller's MQTT commands."
+    )
+    parser.add_argument("--broker", default="127.0.0.1")
+    parser.add_argument("--size", type=int, default=720, help="arena size in pixels")
+    parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="camera latency in seconds"
+    )
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--physics-rate", type=float, default=200.0)
+    parser.add_argument(
+        "--max-wheel-speed", type=float, default=120.0, help="pixels per second"
+    )
+    parser.add_argument("--wheel-base", type=float, default=50.0, help="pixels")
+    parser.add_argument(
+        "--gripper-time",
+        type=float,
+        default=0.5,
+        help="seconds for the gripper to open or close",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=None, help="stop after this many seconds"
+    )
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between reports")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_world(args.size, args.seed)
+
+    client = mqtt.Client(
+        userdata={
+            "max_speed": args.max_wheel_speed,
+            "gripper_time": args.gripper_time,
+        }
+    )
+    client.on_message = on_message
+    client.connect(args.broker, MQTT_PORT, 60)
+    for robot_id in ROBOT_IDS:
+        for side in ("left", "right"):
+            for direction in ("forward", "backward"):
+                client.subscribe(f"/robot{robot_id}_{side}_{direction}")
+        for action in ("open", "close"):
+            client.subscribe(f"/robot{robot_id}_gripper_{action}")
+        client.subscribe(f"/robot{robot_id}_ping")
+    client.loop_start()
+
+    threading.Thread(
+        target=physics_loop,
+        args=(args.physics_rate, args.wheel_base),
+        daemon=True,
+    ).start()
+    threading.Thread(
+        target=camera_loop, args=(args.fps, args.latency, args.quality), daemon=True
+    ).start()
+    threading.Thread(
+        target=app.run,
+        kwargs={"host": args.host, "port": args.port, "threaded": True},
+        daemon=True,
+    ).start()
+
+    print(f"Camera stream on http://{args.host}:{args.port}/video_feed")
+    while args.duration is None or get_stats()["sim_seconds"] < args.duration:
+        time.sleep(args.report)
+        result = get_stats()
+        print(
+            f"sim {result['sim_seconds']:.0f}s: {result['delivered']} delivered, "
+            f"{result['remaining']} remaining, "
+            f"{result['tasks_per_minute']:.2f} tasks/min"
+        )
+        if result["remaining"] == 0:
+            break
+
+    client.loop_stop()
+    client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
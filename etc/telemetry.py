@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+
+def summarize(path):
+    """One line of headline numbers for a recorded run."""
+    log = main.load_telemetry(path)
+    times = np.concatenate([records["time"] for records in log.values()])
+    duration = times.max() - times.min() if len(times) else 0.0
+
+    pid = log["pid"]
+    errors = pid["values"][:, :3]
+    rms = np.sqrt(np.mean(errors**2, axis=0)) if len(pid) else np.full(3, np.nan)
+    frames = len(np.unique(log["pose"]["sequence"]))
+    paths = len(np.unique(log["path"]["sequence"]))
+    commands = log["command"]
+    grips = np.isin(
+        commands["item"],
+        [main.TELEMETRY_COMMANDS.index(name) for name in ("gripper_close", "gripper_open")],
+    ).sum()
+
+    return (
+        f"{os.path.basename(path)}: {duration:.1f} s, {frames} frames, "
+        f"{paths} paths, {len(pid)} controller updates, "
+        f"{len(commands)} commands ({grips} gripper), "
+        f"PID error rms left/right/center {rms[0]:.1f}/{rms[1]:.1f}/{rms[2]:.1f}"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Summarize recorded telemetry logs.")
+    parser.add_argument("logs", nargs="+", help="telemetry .tlm files")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for path in args.logs:
+        print(summarize(path))
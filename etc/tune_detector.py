@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+# Values tried for each tuned setting; the first entry of each is OpenCV's default
+SEARCH_SPACE = {
+    "detection_scale": [1.0, 0.75, 0.5, 0.35],
+    "adaptiveThreshWinSizeMin": [3, 5, 7],
+    "adaptiveThreshWinSizeMax": [23, 13, 33, 53],
+    "adaptiveThreshWinSizeStep": [10, 4, 20],
+    "minMarkerPerimeterRate": [0.03, 0.01, 0.02, 0.05],
+    "maxMarkerPerimeterRate": [4.0, 1.0, 2.0],
+    "polygonalApproxAccuracyRate": [0.03, 0.02, 0.05, 0.08],
+}
+
+# Exhaustive settings used to decide which markers each frame should yield
+REFERENCE = {
+    "detection_scale": 1.0,
+    "adaptiveThreshWinSizeMin": 3,
+    "adaptiveThreshWinSizeMax": 53,
+    "adaptiveThreshWinSizeStep": 4,
+    "minMarkerPerimeterRate": 0.01,
+    "maxMarkerPerimeterRate": 4.0,
+    "polygonalApproxAccuracyRate": 0.05,
+}
+
+KNOWN_IDS = (
+    set(main.CORNER_MARKERS)
+    | {main.INORGANIC_DROP_OFF_ID, main.ORGANIC_DROP_OFF_ID}
+    | set(main.ROBOT_IDS)
+    | set(main.INORGANIC_WASTE_ID)
+    | set(main.ORGANIC_WASTE_ID)
+)
+
+
+def load_frames(path, count):
+    """Decode count frames spread evenly over the video."""
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    wanted = {int(i * total / count) for i in range(count)} if total else None
+
+    frames = []
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if wanted is None or index in wanted:
+            frames.append(frame)
+        index += 1
+    cap.release()
+
+    if not frames:
+        raise ValueError(f"No frames decoded from {path}")
+    return frames[:count]
+
+
+def make_parameters(config):
+    detector_parameters = cv2.aruco.DetectorParameters()
+    for name, value in config.items():
+        if name != "detection_scale":
+            setattr(detector_parameters, name, value)
+    return detector_parameters
+
+
+def detect_ids(frame, config, detector_parameters):
+    _, ids = main.find_marker_corners(
+        frame, main.aruco_dict, config["detection_scale"], detector_parameters
+    )
+    return set() if ids is None else {int(i) for i in ids.flatten()}
+
+
+def evaluate(frames, expected, config, repeats=3):
+    """
+    Return (seconds per frame, fraction of expected IDs found) for a config.
+    The time is the median of `repeats` passes, after one warm-up detection.
+    """
+    detector_parameters = make_parameters(config)
+    detect_ids(frames[0], config, detector_parameters)
+
+    timings = []
+    for _ in range(repeats):
+        found = 0
+        start = time.perf_counter()
+        for frame, frame_expected in zip(frames, expected):
+            found += len(detect_ids(frame, config, detector_parameters) & frame_expected)
+        timings.append((time.perf_counter() - start) / len(frames))
+
+    total = sum(len(frame_expected) for frame_expected in expected)
+    return float(np.median(timings)), found / total if total else 1.0
+
+
+def candidate_configs(trials, seed):
+    """OpenCV's defaults followed by random, valid draws from SEARCH_SPACE."""
+    rng = random.Random(seed)
+    configs = [{name: values[0] for name, values in SEARCH_SPACE.items()}]
+    seen = {tuple(configs[0].items())}
+    for _ in range(trials * 20):
+        if len(configs) > trials:
+            break
+        config = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        if config["adaptiveThreshWinSizeMin"] > config["adaptiveThreshWinSizeMax"]:
+            continue
+        if tuple(config.items()) not in seen:
+            seen.add(tuple(config.items()))
+            configs.append(config)
+    return configs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Search ArUco detector settings for the fastest one that still finds every marker."
+    )
+    parser.add_argument(
+        "--video",
+        default=os.path.join(os.path.dirname(main.DETECTOR_PROFILE), "videos", "six.mp4"),
+    )
+    parser.add_argument("--frames", type=int, default=60, help="frames to sample")
+    parser.add_argument("--trials", type=int, default=80, help="configs to try")
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="timed passes per config, median taken"
+    )
+    parser.add_argument(
+        "--min-recall",
+        type=float,
+        default=1.0,
+        help="fraction of expected IDs a config must find to be eligible",
+    )
+    parser.add_argument(
+        "--expected",
+        default=None,
+        help="comma separated IDs present in every frame (default: whatever an "
+        "exhaustive reference detection finds among the arena's known IDs)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=main.DETECTOR_PROFILE)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    frames = load_frames(args.video, args.frames)
+    height, width = frames[0].shape[:2]
+    print(f"Loaded {len(frames)} frames at {width}x{height} from {args.video}")
+
+    if args.expected:
+        ids = {int(marker_id) for marker_id in args.expected.split(",")}
+        expected = [ids for _ in frames]
+    else:
+        reference_parameters = make_parameters(REFERENCE)
+        expected = [
+            detect_ids(frame, REFERENCE, reference_parameters) & KNOWN_IDS
+            for frame in frames
+        ]
+    total = sum(len(frame_expected) for frame_expected in expected)
+    print(f"Expecting {total} marker detections in total")
+
+    results = []
+    for config in candidate_configs(args.trials, args.seed):
+        elapsed, recall = evaluate(frames, expected, config, args.repeats)
+        results.append((elapsed, recall, config))
+
+    # Report every config, fastest first, marking the speed/recall Pareto front
+    results.sort(key=lambda result: (result[0], -result[1]))
+    print(f"\n{'ms/frame':>9} {'recall':>7}  settings")
+    best_recall = -1.0
+    for elapsed, recall, config in results:
+        front = "*" if recall > best_recall else " "
+        best_recall = max(best_recall, recall)
+        settings = " ".join(f"{name}={value}" for name, value in config.items())
+        print(f"{elapsed * 1000:9.2f} {recall:7.1%} {front} {settings}")
+
+    eligible = [result for result in results if result[1] >= args.min_recall]
+    if not eligible:
+        print(f"\nNo config reached a recall of {args.min_recall:.0%}, nothing written")
+        sys.exit(1)
+
+    elapsed, recall, config = eligible[0]
+    profile = {
+        "detection_scale": config["detection_scale"],
+        "parameters": {
+            name: value for name, value in config.items() if name != "detection_scale"
+        },
+        "ms_per_frame": round(elapsed * 1000, 3),
+        "recall": recall,
+        "source": os.path.basename(args.video),
+        "resolution": [width, height],
+    }
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(
+        f"\nWrote {args.output}: {elapsed * 1000:.2f} ms/frame at {recall:.1%} recall"
+    )
@@ -6,21 +6,76 @@ import threading
 import paho.mqtt.client as mqtt
 import math
 import heapq
+import json
+import argparse
+import atexit
+import os
+import queue
+import re
 import time
 import cv2.aruco as aruco
+from collections import OrderedDict, deque
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
 
 # Define constants and setup
 ARENA_WIDTH = 300
 ARENA_HEIGHT = 300
 GRID_SIZE = 2  # Adjust based on your setup
+PLANNING_CELL_SIZE = 15  # Pixels per path planning grid cell
+
+# Camera sources. A camera with reference markers is mapped into the shared
+# arena frame through the homography from those markers' detected centers to
+# their ARENA_MARKER_POSITIONS; a camera without them is used as-is.
+CAMERAS = [
+    {"url": "http://192.168.1.185:8080/video", "reference_markers": None},
+    # {"url": "http://127.0.0.1:5000/video_feed", "reference_markers": None},
+]
+ARENA_MARKER_POSITIONS = {}  # Marker ID -> (x, y) of its center in the arena frame
+FUSION_RADIUS = 20  # Observations of one ID closer than this are one marker
+FUSION_MAX_AGE = 0.5  # Seconds a camera's detections stay in the merged table
+FUSION_WINDOW = 0.05  # Views of one ID further apart in time than this are not merged
 MQTT_BROKER = "192.168.1.117"
 MQTT_PORT = 1883
+GRIPPER_TIMEOUT = 3  # Seconds to wait for a gripper acknowledgement
+LINK_PING_INTERVAL = 1.0  # Seconds between latency probes to each robot
+LINK_PING_TIMEOUT = 2.0  # Seconds after which an unanswered probe counts as lost
+LINK_HISTORY = 100  # Round-trip samples kept per robot for percentiles
+LINK_REPORT_INTERVAL = 10.0  # Seconds between link health reports
+
+# Distributed mode: a vision node publishes every marker table on
+# MARKER_TABLE_TOPIC and controller nodes on other hosts drive their robots from it
+NODE_ROLE = "all"  # "all" (one process), "vision" or "controller"
+MARKER_TABLE_TOPIC = "/arena_markers"
+# Snapshot payload: one header followed by `count` markers. session is drawn
+# at random when the vision node starts, so receivers can tell a restart from
+# reordering. capture_time is wall-clock time, so the hosts' clocks must be
+# synchronized (NTP) for the snapshot ages to be meaningful.
+SNAPSHOT_HEADER = np.dtype(
+    [
+        ("session", "<u4"),
+        ("sequence", "<u4"),
+        ("capture_time", "<f8"),
+        ("count", "<u2"),
+    ]
+)
+SNAPSHOT_MARKER = np.dtype([("id", "<i2"), ("corners", "<f4", (4, 2))])
 CORNER_MARKERS = {0, 1, 2, 3}
 INORGANIC_DROP_OFF_ID = 4
 ORGANIC_DROP_OFF_ID = 5
 ROBOT_IDS = [6]
 INORGANIC_WASTE_ID = [7, 9]
 ORGANIC_WASTE_ID = [8, 10]
+OBSTACLE_RADIUS = 2  # Grid cells kept clear around each obstacle
+PATH_CACHE_SIZE = 256  # Planned paths kept in the LRU cache
+MARKER_INDEX_CELL = 50  # Pixel size of the spatial hash cells over marker points
+EDGE_LABELS = ["Top", "Right", "Bottom", "Left"]
+
+# Pose filtering and prediction
+CAMERA_LATENCY = 0.1  # Seconds between a frame being captured and it being read
+POSE_ALPHA = 0.6  # Weight of a new detection in the position/heading estimate
+POSE_BETA = 0.2  # Weight of a new detection in the velocity estimate
+POSE_TIMEOUT = 1.0  # Seconds a pose may be extrapolated without a detection
 
 # Define PID constants and speeds for each robot
 robot_settings = {
@@ -36,13 +91,16 @@ robot_settings = {
         "D_center": 0.001,
         "backward_speed_left": 10,
         "backward_speed_right": 10,
-        "left_prev_error": 0,
-        "right_prev_error": 0,
-        "center_prev_error": 0,
-        "dt": 0.3,
+        "integral_limit": 500,  # Anti-windup clamp on each integral accumulator
+        "lookahead": 40,  # Pure pursuit lookahead distance along the path, in pixels
+        "curvature_gain": 20,  # Forward speed is divided by 1 + gain * |curvature|
     }
 }
 
+CONTROL_PERIOD = 0.1  # Seconds between controller updates
+MAX_PWM = 255  # Wheel command at which the motors saturate
+WAYPOINT_TOLERANCE = 20  # Pixels from the head to the path's end to count it reached
+
 client = mqtt.Client()
 
 # Initialize shared resources and a lock
@@ -52,16 +110,193 @@ shared_resources = {
     "drop_off_locations": {},
     "paths": {},
     "goal_positions": {},
+    "active_paths": {},  # Path each robot is currently tracking
     "processed_markers": set(),  # Blacklist of processed markers
+    "poses": {},  # Filtered pose estimate of each robot
+    "marker_index": None,  # Spatial index over the current frame's markers
+    "camera_observations": {},  # Latest arena-frame detections of each camera
 }
 resources_lock = threading.Lock()
 
+# Planned paths keyed by (start cell, goal cell, obstacle cells), oldest first
+path_cache = OrderedDict()
+# Reverse distance field of each drop-off, rebuilt when its goal or obstacles change
+drop_off_fields = {}
+planning_lock = threading.Lock()
+
+# Plans the next trip in the background while a gripper is moving
+planner_pool = ThreadPoolExecutor(max_workers=len(ROBOT_IDS))
+
+# Round-trip probes and publish results of each robot's MQTT link
+link_stats = {
+    robot_id: {
+        "sequence": 0,
+        "pending_pings": {},  # Probe sequence number -> send time
+        "rtts": deque(maxlen=LINK_HISTORY),
+        "pings_sent": 0,
+        "pings_lost": 0,
+        "publish_failures": 0,
+        "in_flight": [],  # MQTTMessageInfo of publishes not yet written out
+    }
+    for robot_id in ROBOT_IDS
+}
+link_lock = threading.Lock()
+ROBOT_TOPIC = re.compile(r"^/robot(\d+)_")
+
+# Marker tables sent by this vision node, and those received by a controller node
+snapshot_session = int.from_bytes(os.urandom(4), "little")
+snapshot_sequence = count()
+marker_tables = queue.Queue()  # Snapshot payloads waiting for marker_table_loop()
+vision_stats = {
+    "session": None,  # Vision node session of the last snapshot applied
+    "sequence": None,  # Last snapshot applied
+    "received": 0,
+    "dropped": 0,  # Sequence numbers never received
+    "stale": 0,  # Snapshots that arrived after a newer one
+    "ages": deque(maxlen=LINK_HISTORY),  # Capture to receive, in seconds
+}
+
+# Set when a robot reports its gripper "open" or "closed"
+gripper_events = {
+    robot_id: {"open": threading.Event(), "closed": threading.Event()}
+    for robot_id in ROBOT_IDS
+}
+
 # Define the dictionary to use
 aruco_dict = aruco.getPredefinedDictionary(aruco.DICT_6X6_250)
 
 # Create ArUco parameters
 parameters = cv2.aruco.DetectorParameters()
 
+# Coarse-to-fine detection. Off by default: a downscaled search can miss small
+# markers, so only a tuned detector profile with checked recall lowers the scale
+DETECTION_SCALE = 1.0  # Find markers on a frame downscaled by this factor (1 = off)
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+
+# Tuned detector settings written by etc/tune_detector.py, applied at startup
+DETECTOR_PROFILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "detector_profile.json"
+)
+
+
+def load_detector_profile(path=DETECTOR_PROFILE):
+    """Apply a tuned detector profile to the ArUco parameters, if one exists."""
+    global DETECTION_SCALE
+    if not os.path.exists(path):
+        return False
+
+    with open(path) as f:
+        profile = json.load(f)
+    for name, value in profile.get("parameters", {}).items():
+        setattr(parameters, name, value)
+    DETECTION_SCALE = profile.get("detection_scale", DETECTION_SCALE)
+    print(f"Loaded detector profile from {path}")
+    return True
+
+
+# Binary run log of poses, paths, PID errors and MQTT commands (None disables it)
+TELEMETRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runs")
+TELEMETRY_FLUSH_INTERVAL = 0.5  # Seconds between writes of queued records
+TELEMETRY_KINDS = {"pose": 0, "path": 1, "pid": 2, "command": 3, "snapshot": 4}
+# Command topics after "/robotN_", stored in a command record's item field
+TELEMETRY_COMMANDS = [
+    "left_forward",
+    "left_backward",
+    "right_forward",
+    "right_backward",
+    "gripper_close",
+    "gripper_open",
+    "ping",
+]
+# Every record has the same 40-byte layout so a log can be memory-mapped as is.
+# item and values depend on the kind:
+#   pose:    item = marker ID, values = center x, center y, heading
+#   path:    item = waypoint number, values = x, y
+#   pid:     values = left, right and center errors, left speed, right speed, curvature
+#   command: item = TELEMETRY_COMMANDS index (-1 if unknown), values = payload
+#   snapshot: item = marker count, values = age of a received marker table
+TELEMETRY_RECORD = np.dtype(
+    [
+        ("time", "<f8"),  # time.monotonic() when the record was made
+        ("kind", "u1"),
+        ("robot_id", "u1"),
+        ("item", "<i2"),
+        ("sequence", "<u4"),  # Frame, path, controller step or command number
+        ("values", "<f4", (6,)),
+    ]
+)
+
+telemetry = {
+    "path": None,  # Log file being written, set by start_telemetry()
+    "queue": deque(),  # Records waiting for the writer thread
+    "sequences": {kind: count() for kind in TELEMETRY_KINDS},
+    "file": None,
+    "lock": threading.Lock(),  # Serializes the writer thread and the exit flush
+}
+
+
+def next_telemetry_sequence(kind):
+    return next(telemetry["sequences"][kind])
+
+
+def record_telemetry(kind, robot_id=0, item=0, sequence=0, values=()):
+    """Queue one record for the writer thread; never blocks the caller."""
+    if telemetry["path"] is None:
+        return
+    values = tuple(values) + (math.nan,) * (6 - len(values))
+    telemetry["queue"].append(
+        (time.monotonic(), TELEMETRY_KINDS[kind], robot_id, item, sequence, values)
+    )
+
+
+def flush_telemetry():
+    """Append every queued record to the log."""
+    with telemetry["lock"]:
+        if telemetry["file"] is None:
+            return
+        pending = telemetry["queue"]
+        records = [pending.popleft() for _ in range(len(pending))]
+        if records:
+            telemetry["file"].write(np.array(records, TELEMETRY_RECORD).tobytes())
+            telemetry["file"].flush()
+
+
+def telemetry_writer_loop():
+    """Append queued records to the log in batches."""
+    while True:
+        time.sleep(TELEMETRY_FLUSH_INTERVAL)
+        flush_telemetry()
+
+
+def start_telemetry(directory=TELEMETRY_DIR):
+    """Start logging this run to a new file in directory and return its path."""
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    # Role and pid keep nodes started in the same second on one host apart
+    name = time.strftime("run-%Y%m%d-%H%M%S") + f"-{NODE_ROLE}-{os.getpid()}.tlm"
+    path = os.path.join(directory, name)
+    telemetry["file"] = open(path, "ab")
+    telemetry["path"] = path
+    threading.Thread(target=telemetry_writer_loop, daemon=True).start()
+    # The writer is a daemon thread, so write out the last batch on exit
+    atexit.register(flush_telemetry)
+    print(f"Recording telemetry to {path}")
+    return path
+
+
+def load_telemetry(path):
+    """
+    Memory-map a telemetry log and split it by kind into structured arrays
+    with the fields of TELEMETRY_RECORD.
+    """
+    size = os.path.getsize(path) // TELEMETRY_RECORD.itemsize
+    if size:
+        records = np.memmap(path, TELEMETRY_RECORD, mode="r", shape=(size,))
+    else:
+        records = np.zeros(0, TELEMETRY_RECORD)
+    return {kind: records[records["kind"] == code] for kind, code in TELEMETRY_KINDS.items()}
+
 def get_warped_frame(input_frame, marker_ids, PAD):
     # Detect markers in the frame
     corners, ids, _ = cv2.aruco.detectMarkers(
@@ -163,20 +398,52 @@ def adjust_marker_corners(
     return adjusted_corners
 
 
-def detect_aruco_markers(frame, aruco_dict_type=cv2.aruco.DICT_6X6_250):
-    aruco_dict = cv2.aruco.getPredefinedDictionary(aruco_dict_type)
-    parameters = cv2.aruco.DetectorParameters()  # Updated for some versions of OpenCV
-    corners, ids, rejectedImgPoints = cv2.aruco.detectMarkers(
-        frame, aruco_dict, parameters=parameters
+def find_marker_corners(frame, dictionary, scale=None, detector_parameters=None):
+    """
+    Find markers on a downscaled grayscale copy of the frame, then refine
+    their corners to sub-pixel precision on the full-resolution image, only
+    in small windows around each candidate corner.
+    """
+    if scale is None:
+        scale = DETECTION_SCALE
+    if detector_parameters is None:
+        detector_parameters = parameters
+
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale < 1:
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+
+    corners, ids, _ = cv2.aruco.detectMarkers(
+        small, dictionary, parameters=detector_parameters
     )
+    if ids is None:
+        return [], None
+
+    # Map pixel centers of the small image back onto the full image
+    points = (np.concatenate(corners).reshape(-1, 1, 2) + 0.5) / scale - 0.5
+    points = points.astype(np.float32)
+    window = max(2, int(round(2 / scale)))
+    cv2.cornerSubPix(gray, points, (window, window), (-1, -1), SUBPIX_CRITERIA)
+
+    return list(points.reshape(-1, 1, 4, 2)), ids
+
+
+def detect_aruco_markers(frame, aruco_dict_type=cv2.aruco.DICT_6X6_250):
+    if aruco_dict_type == aruco.DICT_6X6_250:
+        dictionary = aruco_dict
+    else:
+        dictionary = aruco.getPredefinedDictionary(aruco_dict_type)
+    corners, ids = find_marker_corners(frame, dictionary)
 
     markers = {}
     if ids is not None:
         ids = ids.flatten()
         for id, corner in zip(ids, corners):
-            # Process corners to a more readable format
+            # Process corners to a more readable format, keeping sub-pixel precision
             processed_corners = [
-                tuple(map(int, corner_point)) for corner_point in corner[0]
+                tuple(map(float, corner_point)) for corner_point in corner[0]
             ]
 
             # Apply adjustments for specific markers
@@ -188,7 +455,7 @@ def detect_aruco_markers(frame, aruco_dict_type=cv2.aruco.DICT_6X6_250):
                 )
 
             # Recalculate the center based on the processed corners
-            recalculated_center = tuple(map(int, np.mean(processed_corners, axis=0)))
+            recalculated_center = tuple(map(float, np.mean(processed_corners, axis=0)))
 
             # Store both center and corners
             marker_data = {"center": recalculated_center, "corners": processed_corners}
@@ -202,35 +469,139 @@ def detect_aruco_markers(frame, aruco_dict_type=cv2.aruco.DICT_6X6_250):
 
     return markers
 
+def marker_category(marker_id):
+    """Return the index partition a marker ID belongs to."""
+    if marker_id in ORGANIC_WASTE_ID:
+        return "organic"
+    if marker_id in INORGANIC_WASTE_ID:
+        return "inorganic"
+    if marker_id in ROBOT_IDS:
+        return "robot"
+    if marker_id in (INORGANIC_DROP_OFF_ID, ORGANIC_DROP_OFF_ID):
+        return "drop_off"
+    if marker_id in CORNER_MARKERS:
+        return "corner"
+    return "other"
+
+
+def add_to_layer(layer, point, marker_id, label, cell_size):
+    cell = (int(point[0] // cell_size), int(point[1] // cell_size))
+    layer["cells"].setdefault(cell, []).append((point, marker_id, label))
+    bounds = layer["bounds"]
+    bounds[0], bounds[1] = min(bounds[0], cell[0]), max(bounds[1], cell[0])
+    bounds[2], bounds[3] = min(bounds[2], cell[1]), max(bounds[3], cell[1])
+
+
+def build_marker_index(markers, cell_size=MARKER_INDEX_CELL):
+    """
+    Hash marker centers, heads (top edge midpoints) and all edge midpoints
+    into uniform grids, partitioned by marker category.
+    """
+    index = {"cell_size": cell_size, "centers": {}, "heads": {}, "edges": {}}
+    for marker_id, marker_data_list in markers.items():
+        category = marker_category(marker_id)
+        layers = {}
+        for kind in ("centers", "heads", "edges"):
+            layers[kind] = index[kind].setdefault(
+                category, {"cells": {}, "bounds": [math.inf, -math.inf] * 2}
+            )
+
+        for data in marker_data_list:
+            corners = data["corners"]
+            add_to_layer(layers["centers"], data["center"], marker_id, None, cell_size)
+            for i, label in enumerate(EDGE_LABELS):
+                a, b = corners[i], corners[(i + 1) % 4]
+                midpoint = ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
+                add_to_layer(layers["edges"], midpoint, marker_id, label, cell_size)
+                if label == "Top":
+                    add_to_layer(layers["heads"], midpoint, marker_id, None, cell_size)
+    return index
+
+
+def ring_cells(cx, cy, ring):
+    """Cells at Chebyshev distance ring from (cx, cy)."""
+    if ring == 0:
+        return [(cx, cy)]
+    cells = []
+    for dx in range(-ring, ring + 1):
+        cells.append((cx + dx, cy - ring))
+        cells.append((cx + dx, cy + ring))
+    for dy in range(-ring + 1, ring):
+        cells.append((cx - ring, cy + dy))
+        cells.append((cx + ring, cy + dy))
+    return cells
+
+
+def index_nearest(index, kind, categories, point, accept=None):
+    """
+    Return (distance, point, marker_id, label) of the indexed point nearest
+    to point, searching outwards ring by ring. accept(marker_id, label) can
+    reject candidates. Returns None if nothing matches.
+    """
+    cell_size = index["cell_size"]
+    cx, cy = int(point[0] // cell_size), int(point[1] // cell_size)
+    best = None
+
+    for category in categories:
+        layer = index[kind].get(category)
+        if layer is None or not layer["cells"]:
+            continue
+        min_x, max_x, min_y, max_y = layer["bounds"]
+        max_ring = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy)
+
+        for ring in range(int(max_ring) + 1):
+            # Nothing in this ring or beyond can beat the best match so far
+            if best is not None and best[0] <= (ring - 1) * cell_size:
+                break
+            for cell in ring_cells(cx, cy, ring):
+                for item_point, marker_id, label in layer["cells"].get(cell, ()):
+                    if accept is not None and not accept(marker_id, label):
+                        continue
+                    distance = math.hypot(
+                        item_point[0] - point[0], item_point[1] - point[1]
+                    )
+                    if best is None or distance < best[0]:
+                        best = (distance, item_point, marker_id, label)
+    return best
+
+
+def index_items(index, kind, categories):
+    """Iterate over every (point, marker_id, label) in the given partitions."""
+    for category in categories:
+        layer = index[kind].get(category)
+        if layer is not None:
+            for items in layer["cells"].values():
+                yield from items
+
+
 # Manhattan Distance
 def heuristic(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-def astar(start, goal, obstacles, grid_size):
-    # Define the neighbors function
-    def neighbors(position, obstacles, grid_size, obstacle_radius):
-        x, y = position
-        candidates = [
-            (x - 1, y),
-            (x + 1, y),
-            (x, y - 1),
-            (x, y + 1),
-        ]
+def build_blocked_grid(obstacles, grid_size, obstacle_radius=OBSTACLE_RADIUS):
+    """Mark every cell within obstacle_radius (Chebyshev) of an obstacle as blocked."""
+    blocked = np.zeros((grid_size, grid_size), bool)
+    for ox, oy in obstacles:
+        blocked[
+            max(ox - obstacle_radius, 0) : max(ox + obstacle_radius + 1, 0),
+            max(oy - obstacle_radius, 0) : max(oy + obstacle_radius + 1, 0),
+        ] = True
+    return blocked
+
+
+def grid_neighbors(position, blocked):
+    """Return the in-bounds, unblocked 4-neighbors of a grid cell."""
+    x, y = position
+    grid_size = blocked.shape[0]
+    return [
+        (nx, ny)
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+        if 0 <= nx < grid_size and 0 <= ny < grid_size and not blocked[nx, ny]
+    ]
 
-        valid_neighbors = []
-        for neighbor in candidates:
-            nx, ny = neighbor
-            if (
-                0 <= nx < grid_size
-                and 0 <= ny < grid_size
-                and neighbor not in obstacles
-                and all(
-                    abs(ox - nx) > obstacle_radius or abs(oy - ny) > obstacle_radius
-                    for ox, oy in obstacles
-                )
-            ):
-                valid_neighbors.append(neighbor)
-        return valid_neighbors
+
+def astar(start, goal, obstacles, grid_size):
+    blocked = build_blocked_grid(obstacles, grid_size)
 
     # Initialize the data structures
     open_set = []
@@ -246,6 +617,10 @@ def astar(start, goal, obstacles, grid_size):
         # Get the position with the lowest f-score from the open set
         current = heapq.heappop(open_set)[1]
 
+        # Skip stale heap entries for positions that were already expanded
+        if current in closed_set:
+            continue
+
         if current == goal:
             # Reconstruct the path
             path = [current]
@@ -259,29 +634,309 @@ def astar(start, goal, obstacles, grid_size):
         closed_set.add(current)
 
         # Explore the neighbors
-        for neighbor in neighbors(current, obstacles, grid_size, obstacle_radius=2):
+        for neighbor in grid_neighbors(current, blocked):
             neighbor_g_score = g_score[current] + 1
 
             if neighbor in closed_set:
                 continue
 
-            if neighbor not in open_set or neighbor_g_score < g_score[neighbor]:
+            if neighbor not in g_score or neighbor_g_score < g_score[neighbor]:
                 came_from[neighbor] = current
                 g_score[neighbor] = neighbor_g_score
                 f_score[neighbor] = neighbor_g_score + heuristic(neighbor, goal)
-                if neighbor not in open_set:
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                heapq.heappush(open_set, (f_score[neighbor], neighbor))
 
     # No path found
     return None
 
+
+def build_distance_field(goal, obstacles, grid_size):
+    """Breadth-first distance, in grid steps, from every cell to the goal."""
+    blocked = build_blocked_grid(obstacles, grid_size)
+    distances = np.full((grid_size, grid_size), np.inf)
+    distances[goal] = 0
+    queue = deque([goal])
+    while queue:
+        current = queue.popleft()
+        for neighbor in grid_neighbors(current, blocked):
+            if distances[neighbor] == np.inf:
+                distances[neighbor] = distances[current] + 1
+                queue.append(neighbor)
+    return distances
+
+
+def descend_distance_field(start, distances):
+    """Follow a distance field downhill from start to its goal."""
+    grid_size = distances.shape[0]
+    current = start
+    path = [current]
+    while distances[current] != 0:
+        x, y = current
+        candidates = [
+            (nx, ny)
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+            if 0 <= nx < grid_size and 0 <= ny < grid_size
+        ]
+        next_cell = min(candidates, key=lambda cell: distances[cell])
+        if distances[next_cell] >= distances[current]:
+            return None  # The goal is unreachable from start
+        current = next_cell
+        path.append(current)
+    return path
+
+
+def on_mqtt_connect(client, userdata, flags, rc):
+    # Subscribe here so subscriptions survive reconnects
+    for robot_id in ROBOT_IDS:
+        client.subscribe(f"/robot{robot_id}_gripper_status")
+        client.subscribe(f"/robot{robot_id}_pong")
+    if NODE_ROLE == "controller":
+        client.subscribe(MARKER_TABLE_TOPIC)
+
+
+def on_mqtt_message(client, userdata, msg):
+    if msg.topic == MARKER_TABLE_TOPIC:
+        marker_tables.put(msg.payload)
+        return
+    for robot_id, events in gripper_events.items():
+        if msg.topic == f"/robot{robot_id}_gripper_status":
+            state = msg.payload.decode().strip()
+            if state in events:
+                events[state].set()
+        elif msg.topic == f"/robot{robot_id}_pong":
+            record_pong(robot_id, msg.payload)
+
+
 def connect_mqtt():
+    client.on_connect = on_mqtt_connect
+    client.on_message = on_mqtt_message
     client.connect(MQTT_BROKER, MQTT_PORT, 60)
     client.loop_start()
 
 
 def send_mqtt_command(topic, command):
-    client.publish(topic, command)
+    info = client.publish(topic, command)
+
+    # Track the publish result against the robot the topic belongs to
+    match = ROBOT_TOPIC.match(topic)
+    if match:
+        name = topic[match.end():]
+        record_telemetry(
+            "command",
+            int(match.group(1)),
+            TELEMETRY_COMMANDS.index(name) if name in TELEMETRY_COMMANDS else -1,
+            next_telemetry_sequence("command"),
+            (float(command),) if isinstance(command, (int, float, np.number)) else (),
+        )
+    stats = link_stats.get(int(match.group(1))) if match else None
+    if stats is not None:
+        with link_lock:
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                stats["publish_failures"] += 1
+            else:
+                stats["in_flight"].append(info)
+    return info
+
+
+def send_ping(robot_id):
+    """Send a round-trip probe; the robot echoes the payload on its pong topic."""
+    stats = link_stats[robot_id]
+    now = time.monotonic()
+    with link_lock:
+        # Probes that were never answered count as lost
+        for sequence, sent_at in list(stats["pending_pings"].items()):
+            if now - sent_at > LINK_PING_TIMEOUT:
+                del stats["pending_pings"][sequence]
+                stats["pings_lost"] += 1
+
+        sequence = stats["sequence"]
+        stats["sequence"] += 1
+        stats["pending_pings"][sequence] = now
+        stats["pings_sent"] += 1
+    send_mqtt_command(f"/robot{robot_id}_ping", sequence)
+
+
+def record_pong(robot_id, payload):
+    now = time.monotonic()
+    try:
+        sequence = int(payload.decode())
+    except ValueError:
+        return
+    stats = link_stats[robot_id]
+    with link_lock:
+        sent_at = stats["pending_pings"].pop(sequence, None)
+        if sent_at is not None:
+            stats["rtts"].append(now - sent_at)
+
+
+def get_link_health(robot_id):
+    """
+    Summarize a robot's link: round-trip percentiles in seconds, probe loss,
+    failed publishes and publishes still queued in the client.
+    """
+    stats = link_stats[robot_id]
+    with link_lock:
+        stats["in_flight"] = [
+            info for info in stats["in_flight"] if not info.is_published()
+        ]
+        rtts = np.array(stats["rtts"])
+        answered = stats["pings_sent"] - len(stats["pending_pings"])
+        health = {
+            "pings_sent": stats["pings_sent"],
+            "loss": stats["pings_lost"] / answered if answered else 0.0,
+            "publish_failures": stats["publish_failures"],
+            "queue_depth": len(stats["in_flight"]),
+        }
+
+    for percentile in (50, 95, 99):
+        health[f"rtt_p{percentile}"] = (
+            float(np.percentile(rtts, percentile)) if len(rtts) else None
+        )
+    return health
+
+
+def get_command_latency(robot_id):
+    """Estimated one-way delay from publishing a command to the robot acting on it."""
+    with link_lock:
+        rtts = list(link_stats[robot_id]["rtts"]) if robot_id in link_stats else []
+    return float(np.median(rtts)) / 2 if rtts else 0.0
+
+
+def link_monitor_loop(robot_ids=ROBOT_IDS):
+    """Probe the robots' links and periodically report their health."""
+    last_report = time.monotonic()
+    while True:
+        for robot_id in robot_ids:
+            send_ping(robot_id)
+
+        if time.monotonic() - last_report >= LINK_REPORT_INTERVAL:
+            last_report = time.monotonic()
+            if NODE_ROLE == "controller":
+                health = get_vision_health()
+                ages = [
+                    f"{health[f'age_p{p}'] * 1000:.1f}"
+                    if health[f"age_p{p}"] is not None
+                    else "-"
+                    for p in (50, 95, 99)
+                ]
+                print(
+                    f"Vision link: snapshot age p50/p95/p99 {'/'.join(ages)} ms, "
+                    f"received {health['received']}, loss {health['loss']:.1%}, "
+                    f"stale {health['stale']}"
+                )
+            for robot_id in robot_ids:
+                health = get_link_health(robot_id)
+                rtts = [
+                    f"{health[f'rtt_p{p}'] * 1000:.1f}"
+                    if health[f"rtt_p{p}"] is not None
+                    else "-"
+                    for p in (50, 95, 99)
+                ]
+                print(
+                    f"Robot {robot_id} link: rtt p50/p95/p99 {'/'.join(rtts)} ms, "
+                    f"loss {health['loss']:.1%}, "
+                    f"publish failures {health['publish_failures']}, "
+                    f"queue depth {health['queue_depth']}"
+                )
+
+        time.sleep(LINK_PING_INTERVAL)
+
+
+def encode_marker_table(markers, session, sequence, capture_time):
+    """Pack a marker table into a snapshot payload; centers are left to the receiver."""
+    entries = [
+        (marker_id, data["corners"])
+        for marker_id, marker_data_list in markers.items()
+        for data in marker_data_list
+    ]
+    header = np.array(
+        [(session, sequence, capture_time, len(entries))], SNAPSHOT_HEADER
+    )
+    body = np.array(entries, SNAPSHOT_MARKER)
+    return header.tobytes() + body.tobytes()
+
+
+def decode_marker_table(payload):
+    """Unpack a snapshot payload into (session, sequence, capture_time, markers)."""
+    header = np.frombuffer(payload, SNAPSHOT_HEADER, count=1)[0]
+    body = np.frombuffer(
+        payload, SNAPSHOT_MARKER, count=header["count"], offset=SNAPSHOT_HEADER.itemsize
+    )
+    markers = {}
+    for marker_id, corners in zip(body["id"].tolist(), body["corners"]):
+        markers.setdefault(marker_id, []).append(
+            {
+                "center": tuple(map(float, corners.mean(axis=0))),
+                "corners": [tuple(map(float, corner)) for corner in corners],
+            }
+        )
+    return (
+        int(header["session"]),
+        int(header["sequence"]),
+        float(header["capture_time"]),
+        markers,
+    )
+
+
+def publish_marker_table(markers, capture_time):
+    """Send the current marker table to the controller nodes."""
+    # Stamp with wall-clock time so other hosts can measure the snapshot's age
+    wall_time = time.time() - (time.monotonic() - capture_time)
+    payload = encode_marker_table(
+        markers, snapshot_session, next(snapshot_sequence), wall_time
+    )
+    client.publish(MARKER_TABLE_TOPIC, payload)
+
+
+def receive_marker_table(payload):
+    """Apply a snapshot from the vision node, dropping any older than the last one."""
+    session, sequence, wall_time, markers = decode_marker_table(payload)
+    age = time.time() - wall_time
+    with link_lock:
+        # A new session means the vision node restarted its sequence numbers
+        last = vision_stats["sequence"]
+        if session != vision_stats["session"]:
+            last = None
+        if last is not None and sequence <= last:
+            vision_stats["stale"] += 1
+            return
+        if last is not None:
+            vision_stats["dropped"] += sequence - last - 1
+        vision_stats["session"] = session
+        vision_stats["sequence"] = sequence
+        vision_stats["received"] += 1
+        vision_stats["ages"].append(age)
+
+    record_telemetry("snapshot", item=len(markers), sequence=sequence, values=(age,))
+    update_marker_table(None, markers, time.monotonic() - age)
+
+
+def marker_table_loop():
+    """
+    Apply received snapshots off the MQTT network thread, so building the
+    marker table does not delay the pong timestamps behind the RTT estimates.
+    """
+    while True:
+        receive_marker_table(marker_tables.get())
+
+
+def get_vision_health():
+    """Summarize the snapshots received from the vision node: ages in seconds and loss."""
+    with link_lock:
+        ages = np.array(vision_stats["ages"])
+        received = vision_stats["received"]
+        dropped = vision_stats["dropped"]
+        health = {
+            "received": received,
+            "loss": dropped / (received + dropped) if received + dropped else 0.0,
+            "stale": vision_stats["stale"],
+        }
+
+    for percentile in (50, 95, 99):
+        health[f"age_p{percentile}"] = (
+            float(np.percentile(ages, percentile)) if len(ages) else None
+        )
+    return health
 
 
 def get_bot_position(bot_id, markers):
@@ -294,133 +949,223 @@ def get_bot_position(bot_id, markers):
             return center_x, center_y
     return None
 
-def calculate_distances(robot_corners, next_position):
-    center, tl, tr = robot_corners
-    goal = next_position
-    d_center = math.hypot(center[0] - goal[0], center[1] - goal[1])
-    d_left = math.hypot(tl[0] - goal[0], tl[1] - goal[1])
-    d_right = math.hypot(tr[0] - goal[0], tr[1] - goal[1])
-    return d_right, d_left, d_center
-
-def move_towards_goal(robot_id, path, threshold=10):
-    """
-    Move the robot towards the goal following the path.
-    """
-    settings = robot_settings[robot_id]
-    P_left = settings["P_left"]
-    P_right = settings["P_right"]
-    P_center = settings["P_center"]
-    I_left = settings["I_left"]
-    I_right = settings["I_right"]
-    I_center = settings["I_center"]
-    D_left = settings["D_left"]
-    D_right = settings["D_right"]
-    D_center = settings["D_center"]
-    backward_speed_left = settings["backward_speed_left"]
-    backward_speed_right = settings["backward_speed_right"]
-    left_prev_error = settings["left_prev_error"]
-    right_prev_error = settings["right_prev_error"]
-    center_prev_error = settings["center_prev_error"]
-    dt = settings["dt"]
-
-    for next_position in path:
-        position_reached = False
-        while not position_reached:
-            with resources_lock:
-                # Extracting robot head position, top left, top right corners, and robot center
-                _, tl, tr, robot_center = get_head_position(
-                    robot_id, shared_resources["markers"]
-                )
-                if tl is None or tr is None or robot_center is None:
-                    time.sleep(0)
-                    continue
+def build_controller_bank(settings):
+    """
+    Pack the PID gains and state of every robot into NumPy arrays, one row
+    per robot and one column per channel (left, right, center).
+    """
+    robot_ids = list(settings)
+    rows = [settings[robot_id] for robot_id in robot_ids]
+    channels = ("left", "right", "center")
+    return {
+        "robot_ids": robot_ids,
+        "P": np.array([[row[f"P_{c}"] for c in channels] for row in rows], float),
+        "I": np.array([[row[f"I_{c}"] for c in channels] for row in rows], float),
+        "D": np.array([[row[f"D_{c}"] for c in channels] for row in rows], float),
+        "integral_limit": np.array([[row["integral_limit"]] for row in rows], float),
+        "lookahead": np.array([row["lookahead"] for row in rows], float),
+        "curvature_gain": np.array([row["curvature_gain"] for row in rows], float),
+        "backward_speed": np.array(
+            [[row["backward_speed_left"], row["backward_speed_right"]] for row in rows],
+            float,
+        ),
+        "integral": np.zeros((len(rows), 3)),
+        "prev_error": np.zeros((len(rows), 3)),
+        "active": np.zeros(len(rows), bool),  # prev_error holds a real sample
+        "reached": {robot_id: threading.Event() for robot_id in robot_ids},
+    }
+
+
+controller_bank = build_controller_bank(robot_settings)
 
-                # Update the goal position for the current robot
-                shared_resources["goal_positions"][robot_id] = next_position
 
-            # Pass the robot center along with corners to calculate distances
-            d_right, d_left, d_center = calculate_distances(
-                (robot_center, tl, tr), next_position
+def pure_pursuit_target(tracked_path, position, lookahead):
+    """
+    Advance the tracked path's progress to the segment closest to position
+    and return the point lookahead pixels further along the path.
+    """
+    path = tracked_path["path"]
+    progress = tracked_path["progress"]
+    if progress >= len(path) - 1:
+        return path[-1]
+
+    # Project the position onto every remaining segment and keep the closest
+    starts = path[progress:-1]
+    segments = path[progress + 1 :] - starts
+    lengths = np.maximum(np.einsum("ij,ij->i", segments, segments), 1e-9)
+    t = np.clip(np.einsum("ij,ij->i", position - starts, segments) / lengths, 0, 1)
+    projections = starts + segments * t[:, None]
+    closest = int(np.argmin(np.hypot(*(projections - position).T)))
+    progress += closest
+    tracked_path["progress"] = progress
+
+    # Walk lookahead pixels forward from the projection
+    point = projections[closest]
+    remaining = lookahead
+    for next_point in path[progress + 1 :]:
+        distance = math.hypot(*(next_point - point))
+        if distance >= remaining:
+            return point + (next_point - point) * remaining / distance
+        remaining -= distance
+        point = next_point
+    return path[-1]
+
+
+def controller_step(dt):
+    """
+    Run one vectorized update for every robot that is tracking a path:
+    pure pursuit picks a lookahead point on the path, the PID channels steer
+    towards it and the forward speed is scheduled on the pursuit curvature.
+    Returns {robot_id: (left_speed, right_speed, tracked_path, reached)}.
+    """
+    bank = controller_bank
+    n = len(bank["robot_ids"])
+    points = np.full((6, n, 2), np.nan)  # head, tl, tr, center, goal, path end
+
+    # Steer from where each robot will be when its command takes effect
+    now = time.monotonic()
+    act_times = {
+        robot_id: now + get_command_latency(robot_id) for robot_id in bank["robot_ids"]
+    }
+
+    with resources_lock:
+        tracked_paths = dict(shared_resources["active_paths"])
+        for i, robot_id in enumerate(bank["robot_ids"]):
+            tracked_path = tracked_paths.get(robot_id)
+            if tracked_path is None:
+                continue
+            head, tl, tr, center = get_predicted_head_position(
+                robot_id, act_times[robot_id]
             )
+            if head is None:
+                continue
+            goal = pure_pursuit_target(
+                tracked_path, np.array(head), bank["lookahead"][i]
+            )
+            points[:, i] = (head, tl, tr, center, goal, tracked_path["path"][-1])
+            # Update the goal position for the current robot
+            shared_resources["goal_positions"][robot_id] = tuple(goal)
+
+    head, tl, tr, center, goal, path_end = points
+    valid = ~np.isnan(goal[:, 0])
+
+    # Robots without a path or pose start from a clean state next time
+    bank["integral"][~valid] = 0
+    bank["active"] &= valid
+    if not valid.any():
+        return {}
+
+    d_left = np.hypot(*(tl - goal).T)
+    d_right = np.hypot(*(tr - goal).T)
+    d_center = np.hypot(*(center - goal).T)
+    error = np.stack([d_left - d_right, d_right - d_left, d_center], axis=1)
+
+    derivative = np.where(
+        bank["active"][:, None], (error - bank["prev_error"]) / dt, 0.0
+    )
+    integral = np.clip(
+        bank["integral"] + error * dt, -bank["integral_limit"], bank["integral_limit"]
+    )
+    output = bank["P"] * error + bank["I"] * integral + bank["D"] * derivative
+
+    # Pure pursuit curvature of the arc from the robot through the goal
+    forward = head - center
+    to_goal = goal - center
+    alpha = np.arctan2(
+        forward[:, 0] * to_goal[:, 1] - forward[:, 1] * to_goal[:, 0],
+        np.einsum("ij,ij->i", forward, to_goal),
+    )
+    curvature = 2 * np.sin(alpha) / np.maximum(d_center, 1e-9)
+    forward_speed = output[:, 2] / (1 + bank["curvature_gain"] * np.abs(curvature))
+
+    left_speed = output[:, 0] + forward_speed
+    right_speed = output[:, 1] + forward_speed
+
+    # Anti-windup: stop integrating while the wheel commands are saturated
+    saturated = (np.abs(left_speed) > MAX_PWM) | (np.abs(right_speed) > MAX_PWM)
+    integrate = valid & ~saturated
+    bank["integral"][integrate] = integral[integrate]
+    bank["prev_error"][valid] = error[valid]
+    bank["active"] |= valid
+
+    # Goal behind the head: back up instead of turning on the spot
+    backward = d_center < np.minimum(d_left, d_right)
+    left_speed = np.where(backward, -bank["backward_speed"][:, 0], left_speed)
+    right_speed = np.where(backward, -bank["backward_speed"][:, 1], right_speed)
+
+    reached = np.hypot(*(head - path_end).T) < WAYPOINT_TOLERANCE
+
+    step = next_telemetry_sequence("pid")
+    for i in np.flatnonzero(valid):
+        record_telemetry(
+            "pid",
+            bank["robot_ids"][i],
+            sequence=step,
+            values=(*error[i], left_speed[i], right_speed[i], curvature[i]),
+        )
 
-            # Determine movement command based on distances
-            if d_center < min(d_right, d_left):
-                send_mqtt_command(
-                    f"/robot{robot_id}_left_backward", backward_speed_left
-                )
-                send_mqtt_command(
-                    f"/robot{robot_id}_right_backward", backward_speed_right
-                )
-                print("backwards")
-            else:
-                left_error = d_left - d_right
-                right_error = d_right - d_left
-                d_center_error = d_center
-
-                left_P_gain = P_left * left_error
-                right_P_gain = P_right * right_error
-                center_P_gain = P_center * d_center_error
-                left_I_gain = I_left * (left_error + left_prev_error) * dt
-                right_I_gain = I_right * (right_error + right_prev_error) * dt
-                center_I_gain = P_center * (d_center_error + center_prev_error) * dt
-                left_D_gain = (D_left * (left_error - left_prev_error)) / dt
-                right_D_gain = (D_right * (right_error - right_prev_error)) / dt
-                center_D_gain = (D_center * (d_center_error - center_prev_error)) / dt
-                center_prev_error = d_center_error
-                right_prev_error = right_error
-                left_prev_error = left_error
-
-                left_speed = (
-                    left_P_gain
-                    + left_I_gain
-                    + left_D_gain
-                    + center_P_gain
-                    + center_I_gain
-                    + center_D_gain
-                )
-                right_speed = (
-                    right_P_gain
-                    + right_I_gain
-                    + right_D_gain
-                    + center_P_gain
-                    + center_I_gain
-                    + center_D_gain
-                )
+    return {
+        robot_id: (left_speed[i], right_speed[i], tracked_paths[robot_id], reached[i])
+        for i, robot_id in enumerate(bank["robot_ids"])
+        if valid[i]
+    }
+
+
+def send_wheel_speeds(robot_id, left_speed, right_speed):
+    """Publish signed wheel speeds as forward/backward commands."""
+    if left_speed >= 0:
+        send_mqtt_command(f"/robot{robot_id}_left_forward", left_speed)
+    else:
+        send_mqtt_command(f"/robot{robot_id}_left_backward", abs(left_speed))
+    if right_speed >= 0:
+        send_mqtt_command(f"/robot{robot_id}_right_forward", right_speed)
+    else:
+        send_mqtt_command(f"/robot{robot_id}_right_backward", abs(right_speed))
+
+
+def control_loop():
+    """Drive every robot towards its current goal from a single thread."""
+    last_step = time.monotonic()
+    while True:
+        now = time.monotonic()
+        commands = controller_step(max(now - last_step, 1e-3))
+        last_step = now
+
+        with resources_lock:
+            for robot_id, command in commands.items():
+                left_speed, right_speed, tracked_path, reached = command
+                # Skip robots whose path changed while the step was running
+                if shared_resources["active_paths"].get(robot_id) is not tracked_path:
+                    continue
                 print(f"Left Speed:{left_speed} Right Speed:{right_speed}")
+                send_wheel_speeds(robot_id, left_speed, right_speed)
+                if reached:
+                    controller_bank["reached"][robot_id].set()
 
-                if left_speed >= 0:
-                    send_mqtt_command(f"/robot{robot_id}_left_forward", left_speed)
-                if left_speed < 0:
-                    send_mqtt_command(
-                        f"/robot{robot_id}_left_backward", abs(left_speed)
-                    )
-                if right_speed >= 0:
-                    send_mqtt_command(f"/robot{robot_id}_right_forward", right_speed)
-                if right_speed < 0:
-                    send_mqtt_command(
-                        f"/robot{robot_id}_right_backward", abs(right_speed)
-                    )
+        time.sleep(max(0.0, CONTROL_PERIOD - (time.monotonic() - now)))
 
-            # Check if the robot has reached the next position
-            with resources_lock:
-                current_position, _, _, _ = get_head_position(
-                    robot_id, shared_resources["markers"]
-                )
 
-                # Update the goal position for the current robot
-                shared_resources["goal_positions"][robot_id] = next_position
+def move_towards_goal(robot_id, path):
+    """
+    Move the robot towards the goal following the path. control_loop()
+    tracks the whole path continuously; this blocks until its end is reached.
+    """
+    reached = controller_bank["reached"][robot_id]
+    with resources_lock:
+        reached.clear()
+        shared_resources["active_paths"][robot_id] = {
+            "path": np.array(path, float),
+            "progress": 0,
+        }
 
-                if (
-                    current_position
-                    and math.hypot(
-                        current_position[0] - next_position[0],
-                        current_position[1] - next_position[1],
-                    )
-                    < 20
-                ):
-                    position_reached = True
+    path_number = next_telemetry_sequence("path")
+    for waypoint_number, waypoint in enumerate(path):
+        record_telemetry("path", robot_id, waypoint_number, path_number, waypoint)
+    reached.wait()
 
-            time.sleep(0.3)  # Adjust sleep time as needed
+    with resources_lock:
+        shared_resources["active_paths"].pop(robot_id, None)
+        shared_resources["goal_positions"].pop(robot_id, None)
 
 
 def draw_lines_to_goal(
@@ -496,29 +1241,132 @@ def get_head_position(robot_id, markers):
             tl, tr, br, bl = corners[0], corners[1], corners[2], corners[3]
 
             # Calculate the midpoint between tl and tr for the head position
-            head_position = (int((tl[0] + tr[0]) / 2), int((tl[1] + tr[1]) / 2))
+            head_position = (
+                float((tl[0] + tr[0]) / 2),
+                float((tl[1] + tr[1]) / 2),
+            )
 
             # Calculate the center of the marker as the average of all corners
-            center_x = int((tl[0] + tr[0] + br[0] + bl[0]) / 4)
-            center_y = int((tl[1] + tr[1] + br[1] + bl[1]) / 4)
+            center_x = float((tl[0] + tr[0] + br[0] + bl[0]) / 4)
+            center_y = float((tl[1] + tr[1] + br[1] + bl[1]) / 4)
             marker_center = (center_x, center_y)
 
-            # Ensure tl and tr are tuples of integers
-            tl = (int(tl[0]), int(tl[1]))
-            tr = (int(tr[0]), int(tr[1]))
+            # Ensure tl and tr are tuples of floats, keeping sub-pixel precision
+            tl = (float(tl[0]), float(tl[1]))
+            tr = (float(tr[0]), float(tr[1]))
 
             return head_position, tl, tr, marker_center
     return None, None, None, None
 
 
+def wrap_angle(angle):
+    """Wrap an angle into [-pi, pi)."""
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+def rotate(point, angle):
+    c, s = math.cos(angle), math.sin(angle)
+    return (c * point[0] - s * point[1], s * point[0] + c * point[1])
+
+
+def update_pose_estimate(robot_id, markers, timestamp):
+    """
+    Fold the robot's detected marker into its alpha-beta pose filter.
+    timestamp is the capture time of the frame the markers came from.
+    """
+    head, tl, tr, center = get_head_position(robot_id, markers)
+    if head is None:
+        return
+
+    heading = math.atan2(head[1] - center[1], head[0] - center[0])
+    # Marker geometry in the robot's own frame, so it can be re-posed later
+    shape = {
+        name: rotate((point[0] - center[0], point[1] - center[1]), -heading)
+        for name, point in (("head", head), ("tl", tl), ("tr", tr))
+    }
+
+    pose = shared_resources["poses"].get(robot_id)
+    if pose is None or timestamp - pose["time"] > POSE_TIMEOUT:
+        shared_resources["poses"][robot_id] = {
+            "time": timestamp,
+            "x": float(center[0]),
+            "y": float(center[1]),
+            "heading": heading,
+            "vx": 0.0,
+            "vy": 0.0,
+            "omega": 0.0,
+            "shape": shape,
+        }
+        return
+
+    dt = timestamp - pose["time"]
+    if dt <= 0:
+        return
+
+    # Predict forward to this frame, then correct by the measurement residual
+    residual_x = center[0] - (pose["x"] + pose["vx"] * dt)
+    residual_y = center[1] - (pose["y"] + pose["vy"] * dt)
+    residual_heading = wrap_angle(heading - (pose["heading"] + pose["omega"] * dt))
+
+    pose["x"] += pose["vx"] * dt + POSE_ALPHA * residual_x
+    pose["y"] += pose["vy"] * dt + POSE_ALPHA * residual_y
+    pose["heading"] = wrap_angle(
+        pose["heading"] + pose["omega"] * dt + POSE_ALPHA * residual_heading
+    )
+    pose["vx"] += POSE_BETA * residual_x / dt
+    pose["vy"] += POSE_BETA * residual_y / dt
+    pose["omega"] += POSE_BETA * residual_heading / dt
+    pose["time"] = timestamp
+    pose["shape"] = {
+        name: (
+            old[0] + POSE_ALPHA * (shape[name][0] - old[0]),
+            old[1] + POSE_ALPHA * (shape[name][1] - old[1]),
+        )
+        for name, old in pose["shape"].items()
+    }
+
+
+def predict_pose(robot_id, at_time=None):
+    """
+    Extrapolate the robot's filtered pose to at_time (default: now).
+    Returns None if the robot has not been seen within POSE_TIMEOUT.
+    """
+    pose = shared_resources["poses"].get(robot_id)
+    if at_time is None:
+        at_time = time.monotonic()
+    if pose is None or at_time - pose["time"] > POSE_TIMEOUT:
+        return None
+
+    dt = max(0.0, at_time - pose["time"])
+    return {
+        "x": pose["x"] + pose["vx"] * dt,
+        "y": pose["y"] + pose["vy"] * dt,
+        "heading": wrap_angle(pose["heading"] + pose["omega"] * dt),
+        "shape": pose["shape"],
+    }
+
+
+def get_predicted_head_position(robot_id, at_time=None):
+    """
+    Like get_head_position(), but from the filtered pose extrapolated to
+    at_time (default: now), so frames that miss the marker are bridged and
+    camera latency is compensated.
+    """
+    pose = predict_pose(robot_id, at_time)
+    if pose is None:
+        return None, None, None, None
+
+    points = {}
+    for name, offset in pose["shape"].items():
+        dx, dy = rotate(offset, pose["heading"])
+        points[name] = (pose["x"] + dx, pose["y"] + dy)
+
+    return points["head"], points["tl"], points["tr"], (pose["x"], pose["y"])
+
+
 def get_waste_positions(markers, waste_id):
     """Filter and return positions of a specific waste type."""
-    return [
-        data["center"]
-        for marker_id, marker_list in markers.items()
-        if marker_id == waste_id
-        for data in marker_list
-    ]
+    return [data["center"] for data in markers.get(waste_id, [])]
 
 
 def fill_grid_cells_from_corners(corners, grid_size=5):
@@ -542,37 +1390,45 @@ def fill_grid_cells_from_corners(corners, grid_size=5):
     return covered_cells
 
 
-def update_obstacles(markers, target_waste_ids, robot_head_pos):
-    obstacles = set()
-    nearest_waste_pos = None
-    nearest_waste_dist = float("inf")
-    nearest_waste_id = None  # Track the ID of the nearest waste
+def waste_obstacles(target_waste_ids, index, exclude_id=None):
+    """Return the heads of all unprocessed target waste except exclude_id's."""
+    categories = {marker_category(marker_id) for marker_id in target_waste_ids}
+    processed = shared_resources["processed_markers"]
+    return {
+        point
+        for point, marker_id, label in index_items(index, "heads", categories)
+        if marker_id in target_waste_ids
+        and marker_id not in processed
+        and marker_id != exclude_id
+    }
 
-    for marker_id, marker_data_list in markers.items():
-        if (
-            marker_id in target_waste_ids
-            and marker_id not in shared_resources["processed_markers"]
-        ):
-            for marker_data in marker_data_list:
-                corners = marker_data["corners"]
-                tl, tr = corners[0], corners[1]
-                head_center = ((tl[0] + tr[0]) / 2, (tl[1] + tr[1]) / 2)
-                obstacles.add(head_center)
-                distance = np.linalg.norm(
-                    np.array(robot_head_pos) - np.array(head_center)
-                )
-                if distance < nearest_waste_dist:
-                    nearest_waste_dist = distance
-                    nearest_waste_pos = head_center
-                    nearest_waste_id = marker_id
 
-    if nearest_waste_pos:
-        obstacles.discard(nearest_waste_pos)
+def update_obstacles(markers, target_waste_ids, robot_head_pos, index=None):
+    """
+    Return the heads of all unprocessed target waste as obstacles, except
+    the one nearest to the robot, which is returned as the next target.
+    """
+    if index is None:
+        index = build_marker_index(markers)
+    categories = {marker_category(marker_id) for marker_id in target_waste_ids}
+    processed = shared_resources["processed_markers"]
+
+    def is_target(marker_id, label):
+        return marker_id in target_waste_ids and marker_id not in processed
+
+    obstacles = waste_obstacles(target_waste_ids, index)
+
+    nearest = index_nearest(index, "heads", categories, robot_head_pos, is_target)
+    if nearest is None:
+        return obstacles, None, None
+
+    _, nearest_waste_pos, nearest_waste_id = nearest[:3]
+    obstacles.discard(nearest_waste_pos)
 
     return obstacles, nearest_waste_pos, nearest_waste_id
 
 
-def convert_to_grid_coordinates(position, cell_size=15):
+def convert_to_grid_coordinates(position, cell_size=PLANNING_CELL_SIZE):
     """Converts position to grid coordinates."""
     if not isinstance(position, tuple) or len(position) != 2:
         raise ValueError("Position must be a tuple of (x, y).")
@@ -581,7 +1437,7 @@ def convert_to_grid_coordinates(position, cell_size=15):
     return (grid_x, grid_y)
 
 
-def convert_obstacles_to_grid(obstacles, cell_size=15):
+def convert_obstacles_to_grid(obstacles, cell_size=PLANNING_CELL_SIZE):
     """Converts a set of positions to grid coordinates."""
     grid_obstacles = set()
     for position in obstacles:
@@ -593,7 +1449,7 @@ def convert_obstacles_to_grid(obstacles, cell_size=15):
     return grid_obstacles
 
 
-def convert_grid_to_actual(path, cell_size=15):
+def convert_grid_to_actual(path, cell_size=PLANNING_CELL_SIZE):
     """Converts a path of grid coordinates back to actual coordinates."""
     actual_path = [
         (x * cell_size + cell_size // 2, y * cell_size + cell_size // 2)
@@ -602,78 +1458,191 @@ def convert_grid_to_actual(path, cell_size=15):
     return actual_path
 
 
+def planning_grid_size():
+    """Planning grid cells per side, grown to cover a larger multi-camera arena."""
+    # Assuming your grid size is the width/height of the arena divided by GRID_SIZE
+    grid_size = ARENA_WIDTH // GRID_SIZE
+    if ARENA_MARKER_POSITIONS:
+        width, height = arena_frame_size()
+        grid_size = max(grid_size, max(width, height) // PLANNING_CELL_SIZE + 1)
+    return grid_size
+
+
 def plan_path(start, goal, obstacles):
-    """Wrapper for the A* pathfinding."""
+    """Wrapper for the A* pathfinding, memoized in an LRU cache."""
     start_grid = convert_to_grid_coordinates(start)
     goal_grid = convert_to_grid_coordinates(goal)
 
-    obstacles = convert_obstacles_to_grid(obstacles)
+    obstacles = frozenset(convert_obstacles_to_grid(obstacles))
+    key = (start_grid, goal_grid, obstacles)
 
-    # Assuming your grid size is the width/height of the arena divided by GRID_SIZE
-    grid_size = ARENA_WIDTH // GRID_SIZE
+    with planning_lock:
+        if key in path_cache:
+            path_cache.move_to_end(key)
+            path = path_cache[key]
+            return list(path) if path else path
 
-    path = astar(start_grid, goal_grid, obstacles, grid_size)
-    return path  # This will be a list of grid coordinates representing the path
+    path = astar(start_grid, goal_grid, obstacles, planning_grid_size())
 
+    with planning_lock:
+        path_cache[key] = path
+        if len(path_cache) > PATH_CACHE_SIZE:
+            path_cache.popitem(last=False)
 
-def find_nearest_edge_midpoint_to_robot(robot_pos, marker_id, markers):
-    nearest_edge_midpoint = None
-    nearest_edge_label = None
-    min_distance = float("inf")
+    return list(path) if path else path  # List of grid coordinates representing the path
 
-    # Define labels for edges based on their midpoints
-    edge_labels = ["Top", "Right", "Bottom", "Left"]
 
-    if marker_id in markers:
-        for data in markers[marker_id]:
-            corners = data["corners"]
-            # Calculate midpoints of edges
-            midpoints = [
-                (
-                    (corners[0][0] + corners[1][0]) / 2,
-                    (corners[0][1] + corners[1][1]) / 2,
-                ),  # Top edge
-                (
-                    (corners[1][0] + corners[2][0]) / 2,
-                    (corners[1][1] + corners[2][1]) / 2,
-                ),  # Right edge
-                (
-                    (corners[2][0] + corners[3][0]) / 2,
-                    (corners[2][1] + corners[3][1]) / 2,
-                ),  # Bottom edge
-                (
-                    (corners[3][0] + corners[0][0]) / 2,
-                    (corners[3][1] + corners[0][1]) / 2,
-                ),  # Left edge
-            ]
+def plan_path_to_drop_off(start, drop_off_id, drop_off_location, obstacles):
+    """
+    Plan a path to a drop-off by descending its reverse distance field,
+    which is only rebuilt when the drop-off cell or the obstacles change.
+    """
+    start_grid = convert_to_grid_coordinates(start)
+    goal_grid = convert_to_grid_coordinates(drop_off_location)
+    obstacles = frozenset(convert_obstacles_to_grid(obstacles))
+    grid_size = planning_grid_size()
+
+    if not (0 <= start_grid[0] < grid_size and 0 <= start_grid[1] < grid_size):
+        return None
+    if not (0 <= goal_grid[0] < grid_size and 0 <= goal_grid[1] < grid_size):
+        return None
+
+    with planning_lock:
+        field = drop_off_fields.get(drop_off_id)
+        if field is None or field["key"] != (goal_grid, obstacles):
+            field = {
+                "key": (goal_grid, obstacles),
+                "distances": build_distance_field(goal_grid, obstacles, grid_size),
+            }
+            drop_off_fields[drop_off_id] = field
+
+    return descend_distance_field(start_grid, field["distances"])
 
-            # Determine which midpoint is closest to the robot
-            for i, midpoint in enumerate(midpoints):
-                distance = math.hypot(
-                    midpoint[0] - robot_pos[0], midpoint[1] - robot_pos[1]
-                )
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_edge_midpoint = midpoint
-                    nearest_edge_label = edge_labels[i]
 
+def find_nearest_edge_midpoint_to_robot(robot_pos, marker_id, markers, index=None):
+    if index is None:
+        index = build_marker_index(markers)
+
+    nearest = index_nearest(
+        index,
+        "edges",
+        [marker_category(marker_id)],
+        robot_pos,
+        lambda candidate_id, label: candidate_id == marker_id,
+    )
+    if nearest is None:
+        return None, None
+
+    _, nearest_edge_midpoint, _, nearest_edge_label = nearest
     return nearest_edge_midpoint, nearest_edge_label
 
 
+def actuate_gripper(robot_id, action, state):
+    """
+    Send a gripper command and wait until the robot reports the new state,
+    or GRIPPER_TIMEOUT passes.
+    """
+    acknowledged = gripper_events[robot_id][state]
+    acknowledged.clear()
+    send_mqtt_command(f"/robot{robot_id}_gripper_{action}", 1)
+    if not acknowledged.wait(GRIPPER_TIMEOUT):
+        print(f"No gripper acknowledgement from robot {robot_id}, continuing")
+
+
 def pickup_waste(robot_id):
-    send_mqtt_command(f"/robot{robot_id}_gripper_close", 1)
-    time.sleep(3)
+    actuate_gripper(robot_id, "close", "closed")
     print("waste picked")
 
 
-def drop_off_waste(robot_id, waste_id):
-    # Simulate dropping off the waste
-    # After successful drop off, add the marker ID to the blacklist
-    send_mqtt_command(f"/robot{robot_id}_gripper_open", 1)
-    time.sleep(3)
+def drop_off_waste(robot_id):
+    actuate_gripper(robot_id, "open", "open")
     print("waste dropped")
+
+
+def stop_robot(robot_id):
+    send_mqtt_command(f"/robot{robot_id}_right_forward", 0)
+    send_mqtt_command(f"/robot{robot_id}_left_forward", 0)
+
+
+def get_target_waste_ids(robot_id):
+    return ORGANIC_WASTE_ID if robot_id == 6 else INORGANIC_WASTE_ID
+
+
+def get_drop_off_id(target_waste_ids):
+    if target_waste_ids == ORGANIC_WASTE_ID:
+        return ORGANIC_DROP_OFF_ID
+    return INORGANIC_DROP_OFF_ID
+
+
+def plan_waste_trip(robot_id):
+    """
+    Plan the robot's next trip from the latest marker table: a path to the
+    nearest target waste and from there to its drop-off. Returns None if there
+    is no marker table or robot pose yet.
+    """
+    with resources_lock:
+        markers = shared_resources.get("markers", {})
+        marker_index = shared_resources.get("marker_index")
+        drop_off_locations = shared_resources.get("drop_off_locations", {})
+        robot_head_pos, _, _, _ = get_predicted_head_position(robot_id)
+
+    if marker_index is None or not robot_head_pos:
+        return None
+
+    # Determine target waste and calculate path to waste
+    target_waste_ids = get_target_waste_ids(robot_id)
+    obstacles, nearest_waste_pos, nearest_waste_id = update_obstacles(
+        markers, target_waste_ids, robot_head_pos, marker_index
+    )
+
+    path_to_waste, path_to_drop_off = [], []
+    if nearest_waste_pos:
+        nearest_edge_center, _ = find_nearest_edge_midpoint_to_robot(
+            robot_head_pos, nearest_waste_id, markers, marker_index
+        )
+        path_to_waste = plan_path(robot_head_pos, nearest_edge_center, obstacles)
+        path_to_waste = convert_grid_to_actual(path_to_waste) if path_to_waste else []
+
+        # Calculate path to drop-off only if waste is found
+        drop_off_id = get_drop_off_id(target_waste_ids)
+        drop_off_location = drop_off_locations.get(drop_off_id)
+        if drop_off_location:
+            path_to_drop_off = plan_path_to_drop_off(
+                nearest_waste_pos, drop_off_id, drop_off_location, obstacles
+            )
+            path_to_drop_off = (
+                convert_grid_to_actual(path_to_drop_off) if path_to_drop_off else []
+            )
+
+    return {
+        "waste_id": nearest_waste_id,
+        "path_to_waste": path_to_waste,
+        "path_to_drop_off": path_to_drop_off,
+    }
+
+
+def plan_drop_off_trip(robot_id, carried_waste_id):
+    """
+    Re-plan the path to the drop-off from where the robot actually is,
+    avoiding every other target waste but the one in the gripper.
+    """
     with resources_lock:
-        shared_resources["processed_markers"].add(waste_id)
+        marker_index = shared_resources.get("marker_index")
+        drop_off_locations = shared_resources.get("drop_off_locations", {})
+        robot_head_pos, _, _, _ = get_predicted_head_position(robot_id)
+
+    target_waste_ids = get_target_waste_ids(robot_id)
+    drop_off_id = get_drop_off_id(target_waste_ids)
+    drop_off_location = drop_off_locations.get(drop_off_id)
+    if marker_index is None or not robot_head_pos or not drop_off_location:
+        return []
+
+    # Held waste may be out of view, so exclude it by ID rather than by distance
+    obstacles = waste_obstacles(target_waste_ids, marker_index, carried_waste_id)
+    path = plan_path_to_drop_off(
+        robot_head_pos, drop_off_id, drop_off_location, obstacles
+    )
+    return convert_grid_to_actual(path) if path else []
 
 
 def robot_control_loop(robot_id):
@@ -681,102 +1650,174 @@ def robot_control_loop(robot_id):
     # Connect to MQTT
     connect_mqtt()
 
+    next_trip = None
     while True:
-        # Acquire frame and markers
-        with resources_lock:
-            frame = shared_resources.get("frame", None)
-            markers = shared_resources.get("markers", {})
-            drop_off_locations = shared_resources.get("drop_off_locations", {})
-
-        if frame is None:
-            continue
-
-        (
-            robot_head_pos,
-            robot_top_left_corner,
-            robot_top_right_corner,
-            _,
-        ) = get_head_position(robot_id, markers)
+        # Use the trip planned while the gripper was moving, if there is one
+        trip = next_trip.result() if next_trip else plan_waste_trip(robot_id)
+        next_trip = None
 
-        if not robot_head_pos:
-            time.sleep(0)
+        if trip is None:
+            time.sleep(CONTROL_PERIOD)
             continue
 
-        # Determine target waste and calculate path to waste
-        target_waste_ids = ORGANIC_WASTE_ID if robot_id == 6 else INORGANIC_WASTE_ID
-        obstacles, nearest_waste_pos, nearest_waste_id = update_obstacles(
-            markers, target_waste_ids, robot_head_pos
-        )
-
-        # Inside your robot_control_loop, after obtaining nearest_waste_id
-        if nearest_waste_id is not None:
-            (
-                nearest_edge_center,
-                nearest_edge_label,
-            ) = find_nearest_edge_midpoint_to_robot(
-                robot_head_pos, nearest_waste_id, markers
-            )
-
-        path_to_waste, path_to_drop_off = [], []
-        if nearest_waste_pos:
-            path_to_waste = plan_path(robot_head_pos, nearest_edge_center, obstacles)
-            path_to_waste = (
-                convert_grid_to_actual(path_to_waste) if path_to_waste else []
-            )
-
-            # Calculate path to drop-off only if waste is found
-            drop_off_id = (
-                ORGANIC_DROP_OFF_ID
-                if target_waste_ids == ORGANIC_WASTE_ID
-                else INORGANIC_DROP_OFF_ID
-            )
-            drop_off_location = drop_off_locations.get(drop_off_id)
-            if drop_off_location:
-                path_to_drop_off = plan_path(
-                    nearest_waste_pos, drop_off_location, obstacles
-                )
-                path_to_drop_off = (
-                    convert_grid_to_actual(path_to_drop_off) if path_to_drop_off else []
-                )
+        path_to_waste = trip["path_to_waste"]
+        path_to_drop_off = trip["path_to_drop_off"]
 
-        # Update shared resources with calculated paths and head position
+        # Update shared resources with calculated paths
         with resources_lock:
             shared_resources["paths"][robot_id] = {
                 "path_to_waste": path_to_waste,
                 "path_to_drop_off": path_to_drop_off,
             }
 
-        if path_to_waste:
-            move_towards_goal(robot_id, path_to_waste)  # Move towards waste
-            send_mqtt_command(f"/robot{robot_id}_right_forward", 0)
-            send_mqtt_command(f"/robot{robot_id}_left_forward", 0)
-            time.sleep(5)
-            pickup_waste(robot_id)  # Simulate waste pickup
-        else:
-            send_mqtt_command(f"/robot{robot_id}_right_forward", 0)
-            send_mqtt_command(f"/robot{robot_id}_left_forward", 0)
+        if not path_to_waste:
+            stop_robot(robot_id)
+            time.sleep(CONTROL_PERIOD)
+            continue
+
+        move_towards_goal(robot_id, path_to_waste)  # Move towards waste
+        stop_robot(robot_id)
+
+        # Re-plan the drop-off trip while the gripper closes
+        drop_off_trip = planner_pool.submit(
+            plan_drop_off_trip, robot_id, trip["waste_id"]
+        )
+        pickup_waste(robot_id)
+        path_to_drop_off = drop_off_trip.result() or path_to_drop_off
 
         if path_to_drop_off:
+            with resources_lock:
+                shared_resources["paths"][robot_id]["path_to_drop_off"] = (
+                    path_to_drop_off
+                )
             move_towards_goal(robot_id, path_to_drop_off)  # Move towards drop-off
-            send_mqtt_command(f"/robot{robot_id}_right_forward", 0)
-            send_mqtt_command(f"/robot{robot_id}_left_forward", 0)
-            drop_off_waste(robot_id, nearest_waste_id)
+            stop_robot(robot_id)
 
-        # Loop with a delay to prevent constant recalculating
-        time.sleep(0)
+            # Blacklist the delivered marker, then plan the next waste trip
+            # while the gripper opens
+            with resources_lock:
+                shared_resources["processed_markers"].add(trip["waste_id"])
+            next_trip = planner_pool.submit(plan_waste_trip, robot_id)
+            drop_off_waste(robot_id)
 
     # Disconnect MQTT when done
     disconnect_mqtt()
 
 
-def capture_and_update_shared_resources(url):
+def arena_frame_size():
+    """Size of the merged arena frame, padded around the reference markers."""
+    pad = 2 * FUSION_RADIUS
+    width = max(x for x, _ in ARENA_MARKER_POSITIONS.values()) + pad
+    height = max(y for _, y in ARENA_MARKER_POSITIONS.values()) + pad
+    return int(width), int(height)
+
+
+def calibrate_camera(markers, reference_markers):
+    """
+    Return the homography from a camera's image to the arena frame, from the
+    reference markers it can see, or None if it sees fewer than four.
+    """
+    image_points, arena_points = [], []
+    for marker_id in reference_markers:
+        if markers.get(marker_id):
+            image_points.append(markers[marker_id][0]["center"])
+            arena_points.append(ARENA_MARKER_POSITIONS[marker_id])
+    if len(image_points) < 4:
+        return None
+    homography, _ = cv2.findHomography(
+        np.float32(image_points), np.float32(arena_points)
+    )
+    return homography
+
+
+def transform_markers(markers, homography):
+    """Map detected marker corners and centers through a homography."""
+    transformed = {}
+    for marker_id, marker_data_list in markers.items():
+        transformed[marker_id] = []
+        for data in marker_data_list:
+            corners = cv2.perspectiveTransform(
+                np.float32(data["corners"]).reshape(-1, 1, 2), homography
+            ).reshape(-1, 2)
+            transformed[marker_id].append(
+                {
+                    "center": tuple(map(float, corners.mean(axis=0))),
+                    "corners": [tuple(map(float, corner)) for corner in corners],
+                }
+            )
+    return transformed
+
+
+def fuse_camera_observations(observations, now):
+    """
+    Merge every camera's recent detections into one marker table, averaging
+    observations of the same ID that lie within FUSION_RADIUS of each other.
+    Only the views of an ID taken within FUSION_WINDOW of its newest view are
+    used, and each merged marker carries the mean capture "time" of its views.
+    """
+    fresh = [
+        observation
+        for observation in observations.values()
+        if now - observation["time"] <= FUSION_MAX_AGE
+    ]
+    newest = {}
+    for observation in fresh:
+        for marker_id in observation["markers"]:
+            newest[marker_id] = max(newest.get(marker_id, -math.inf), observation["time"])
+
+    clusters = {}
+    for observation in fresh:
+        for marker_id, marker_data_list in observation["markers"].items():
+            # A moving marker seen earlier by a slower camera would lag behind
+            if newest[marker_id] - observation["time"] > FUSION_WINDOW:
+                continue
+            marker_clusters = clusters.setdefault(marker_id, [])
+            for data in marker_data_list:
+                for cluster in marker_clusters:
+                    if math.dist(cluster[0][0]["center"], data["center"]) < FUSION_RADIUS:
+                        cluster.append((data, observation["time"]))
+                        break
+                else:
+                    marker_clusters.append([(data, observation["time"])])
+
+    markers = {}
+    for marker_id, marker_clusters in clusters.items():
+        markers[marker_id] = []
+        for cluster in marker_clusters:
+            corners = np.mean([data["corners"] for data, _ in cluster], axis=0)
+            markers[marker_id].append(
+                {
+                    "center": tuple(map(float, corners.mean(axis=0))),
+                    "corners": [tuple(map(float, corner)) for corner in corners],
+                    "time": float(np.mean([timestamp for _, timestamp in cluster])),
+                }
+            )
+    return markers
+
+
+def compose_arena_frame(observations):
+    """Warp every calibrated camera's latest frame into one arena-frame mosaic."""
+    size = arena_frame_size()
+    mosaic = np.zeros((size[1], size[0], 3), np.uint8)
+    for observation in observations.values():
+        if observation["homography"] is None:
+            continue
+        warped = cv2.warpPerspective(observation["frame"], observation["homography"], size)
+        covered = warped.any(axis=2)
+        mosaic[covered] = warped[covered]
+    return mosaic
+
+
+def capture_and_update_shared_resources(url, camera_index=0, reference_markers=None):
     global shared_resources, resources_lock
     cap = cv2.VideoCapture(url)
+    homography = None
     while True:
         ret, frame = cap.read()
         if not ret:
-            print("Failed to grab frame")
+            print(f"Failed to grab frame from {url}")
             break
+        capture_time = time.monotonic() - CAMERA_LATENCY
 
         # # Perform frame correction here
         # PAD = 8
@@ -793,172 +1834,302 @@ def capture_and_update_shared_resources(url):
         #     frame = corrected_frame  # Use the corrected frame for further processing
 
         markers = detect_aruco_markers(frame)  # Detect ArUco markers in the frame
+
+        if reference_markers:
+            # Re-calibrate whenever the reference markers are in view
+            calibration = calibrate_camera(markers, reference_markers)
+            if calibration is not None:
+                homography = calibration
+            if homography is None:
+                continue
+            markers = transform_markers(markers, homography)
+
         with resources_lock:
-            shared_resources["frame"] = frame
-            shared_resources["markers"] = markers
-            shared_resources["drop_off_locations"] = {
-                INORGANIC_DROP_OFF_ID: markers.get(INORGANIC_DROP_OFF_ID)[0]["center"]
-                if markers.get(INORGANIC_DROP_OFF_ID)
-                else None,
-                ORGANIC_DROP_OFF_ID: markers.get(ORGANIC_DROP_OFF_ID)[0]["center"]
-                if markers.get(ORGANIC_DROP_OFF_ID)
-                else None,
+            observations = shared_resources["camera_observations"]
+            observations[camera_index] = {
+                "time": capture_time,
+                "frame": frame,
+                "markers": markers,
+                "homography": homography,
             }
+            if len(observations) > 1:
+                markers = fuse_camera_observations(observations, capture_time)
+
+        if NODE_ROLE == "vision":
+            publish_marker_table(markers, capture_time)
+        update_marker_table(frame, markers, capture_time)
+
+
+def update_marker_table(frame, markers, capture_time):
+    """Hand a new marker table to the planner, pose filter and telemetry."""
+    marker_index = build_marker_index(markers)
+
+    with resources_lock:
+        if frame is not None:
+            shared_resources["frame"] = frame
+        shared_resources["markers"] = markers
+        shared_resources["marker_index"] = marker_index
+        for robot_id in ROBOT_IDS:
+            # Fused markers carry the capture time of the views they came from
+            robot_markers = markers.get(robot_id)
+            timestamp = (
+                robot_markers[0].get("time", capture_time) if robot_markers else capture_time
+            )
+            update_pose_estimate(robot_id, markers, timestamp)
+        shared_resources["drop_off_locations"] = {
+            INORGANIC_DROP_OFF_ID: markers.get(INORGANIC_DROP_OFF_ID)[0]["center"]
+            if markers.get(INORGANIC_DROP_OFF_ID)
+            else None,
+            ORGANIC_DROP_OFF_ID: markers.get(ORGANIC_DROP_OFF_ID)[0]["center"]
+            if markers.get(ORGANIC_DROP_OFF_ID)
+            else None,
+        }
+
+    frame_number = next_telemetry_sequence("pose")
+    for marker_id, marker_data_list in markers.items():
+        for data in marker_data_list:
+            (x0, y0), (x1, y1) = data["corners"][:2]
+            record_telemetry(
+                "pose",
+                item=int(marker_id),
+                sequence=frame_number,
+                values=(*data["center"], math.atan2(y1 - y0, x1 - x0)),
+            )
 
 
 def visualize_robot_behavior():
     global shared_resources, resources_lock
     while True:
+        # Take a consistent snapshot, then draw without holding the lock so
+        # the controller and capture threads are not kept waiting
         with resources_lock:
             frame = shared_resources.get("frame", None)
-            paths = shared_resources.get("paths", {})
+            paths = {
+                robot_id: dict(path_info)
+                for robot_id, path_info in shared_resources.get("paths", {}).items()
+            }
             markers = shared_resources.get("markers", {})
-            goal_positions = shared_resources.get("goal_positions", {})
+            goal_positions = dict(shared_resources.get("goal_positions", {}))
+            observations = dict(shared_resources["camera_observations"])
 
-            if frame is None:
-                continue
+        if frame is None:
+            time.sleep(CONTROL_PERIOD)
+            continue
 
+        # Markers from calibrated cameras are in arena coordinates, so
+        # draw over the arena-frame mosaic rather than a raw camera frame
+        if any(
+            observation["homography"] is not None
+            for observation in observations.values()
+        ):
+            frame_copy = compose_arena_frame(observations)
+        else:
             frame_copy = frame.copy()
 
-            for robot_id in ROBOT_IDS:
-                (
-                    robot_head_pos,
-                    robot_top_left_corner,
-                    robot_top_right_corner,
-                    _,
-                ) = get_head_position(robot_id, markers)
-                if robot_head_pos:
-                    # Draw robot head position
-                    cv2.circle(
-                        frame_copy,
-                        robot_head_pos,
-                        radius=5,
-                        color=(255, 0, 0),
-                        thickness=-1,
-                    )
+        for robot_id in ROBOT_IDS:
+            (
+                robot_head_pos,
+                robot_top_left_corner,
+                robot_top_right_corner,
+                _,
+            ) = get_head_position(robot_id, markers)
+            if robot_head_pos:
+                # Draw robot head position
+                cv2.circle(
+                    frame_copy,
+                    tuple(map(int, robot_head_pos)),
+                    radius=5,
+                    color=(255, 0, 0),
+                    thickness=-1,
+                )
 
-            for robot_id, path_info in paths.items():
-                draw_path(
+        for robot_id, path_info in paths.items():
+            draw_path(
+                frame_copy,
+                path_info["path_to_waste"],
+                (125, 125, 255),
+                2,
+                GRID_SIZE,
+            )
+            draw_path(
+                frame_copy,
+                path_info["path_to_drop_off"],
+                (125, 155, 125),
+                2,
+                GRID_SIZE,
+            )
+
+        for robot_id in ROBOT_IDS:
+            (
+                robot_head_pos,
+                robot_top_left_corner,
+                robot_top_right_corner,
+                robot_center,
+            ) = get_head_position(robot_id, markers)
+
+            # Check if there is a current goal position for the robot
+            if robot_id in goal_positions:
+                goal_position = goal_positions[robot_id]
+                draw_lines_to_goal(
                     frame_copy,
-                    path_info["path_to_waste"],
-                    (125, 125, 255),
-                    2,
-                    GRID_SIZE,
+                    (robot_center, robot_top_left_corner, robot_top_right_corner),
+                    goal_position,
                 )
-                draw_path(
+
+        for marker_id, marker_data in markers.items():
+            for data in marker_data:
+                corners = data["corners"]
+                cv2.polylines(
                     frame_copy,
-                    path_info["path_to_drop_off"],
-                    (125, 155, 125),
-                    2,
-                    GRID_SIZE,
+                    [np.array(corners, np.int32).reshape((-1, 1, 2))],
+                    isClosed=True,
+                    color=(0, 255, 0),
+                    thickness=2,
+                )
+                cv2.circle(
+                    frame_copy,
+                    tuple(map(int, data["center"])),
+                    radius=2,
+                    color=(0, 0, 255),
+                    thickness=-1,
                 )
 
-            for robot_id in ROBOT_IDS:
-                (
-                    robot_head_pos,
-                    robot_top_left_corner,
-                    robot_top_right_corner,
-                    robot_center,
-                ) = get_head_position(robot_id, markers)
-
-                # Check if there is a current goal position for the robot
-                if robot_id in goal_positions:
-                    goal_position = goal_positions[robot_id]
-                    draw_lines_to_goal(
-                        frame_copy,
-                        (robot_center, robot_top_left_corner, robot_top_right_corner),
-                        goal_position,
-                    )
+        for marker_id, marker_data in markers.items():
+            for data in marker_data:
+                corners = data["corners"]
+                center = tuple(map(int, data["center"]))
+
+               # Set color based on marker_id
+                if marker_id == INORGANIC_DROP_OFF_ID:
+                    color = (0, 0, 255) 
+                elif marker_id == ORGANIC_DROP_OFF_ID:
+                    color = (0, 255, 0) 
+                elif marker_id in INORGANIC_WASTE_ID:
+                    color = (255, 0, 0) 
+                elif marker_id in ORGANIC_WASTE_ID:
+                    color = (255, 255, 0) 
+                elif marker_id in CORNER_MARKERS:
+                    color = (100, 100, 100) 
+                else:
+                    color = (255, 0, 255) 
+
+                cv2.polylines(
+                    frame_copy,
+                    [np.array(corners, np.int32).reshape((-1, 1, 2))],
+                    isClosed=True,
+                    color=color,
+                    thickness=2,
+                )
+                cv2.circle(
+                    frame_copy, center, radius=2, color=(0, 0, 255), thickness=-1
+                )
+                # Annotate marker ID
+                cv2.putText(
+                    frame_copy,
+                    str(marker_id),
+                    center,
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    1,
+                    (255, 255, 0),
+                    2,
+                )
 
-            for marker_id, marker_data in markers.items():
-                for data in marker_data:
-                    corners = data["corners"]
-                    cv2.polylines(
-                        frame_copy,
-                        [np.array(corners, np.int32).reshape((-1, 1, 2))],
-                        isClosed=True,
-                        color=(0, 255, 0),
-                        thickness=2,
-                    )
-                    cv2.circle(
-                        frame_copy,
-                        data["center"],
-                        radius=2,
-                        color=(0, 0, 255),
-                        thickness=-1,
-                    )
+        cv2.imshow("Robot Visualization", frame_copy)
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            break
 
-            for marker_id, marker_data in markers.items():
-                for data in marker_data:
-                    corners = data["corners"]
-                    center = data["center"]
-
-                   # Set color based on marker_id
-                    if marker_id == INORGANIC_DROP_OFF_ID:
-                        color = (0, 0, 255) 
-                    elif marker_id == ORGANIC_DROP_OFF_ID:
-                        color = (0, 255, 0) 
-                    elif marker_id in INORGANIC_WASTE_ID:
-                        color = (255, 0, 0) 
-                    elif marker_id in ORGANIC_WASTE_ID:
-                        color = (255, 255, 0) 
-                    elif marker_id in CORNER_MARKERS:
-                        color = (100, 100, 100) 
-                    else:
-                        color = (255, 0, 255) 
-
-                    cv2.polylines(
-                        frame_copy,
-                        [np.array(corners, np.int32).reshape((-1, 1, 2))],
-                        isClosed=True,
-                        color=color,
-                        thickness=2,
-                    )
-                    cv2.circle(
-                        frame_copy, center, radius=2, color=(0, 0, 255), thickness=-1
-                    )
-                    # Annotate marker ID
-                    cv2.putText(
-                        frame_copy,
-                        str(marker_id),
-                        center,
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (255, 255, 0),
-                        2,
-                    )
 
-            cv2.imshow("Robot Visualization", frame_copy)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+def parse_robot_ids(value):
+    robot_ids = [int(robot_id) for robot_id in value.split(",")]
+    unknown = set(robot_ids) - set(ROBOT_IDS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown robot IDs {sorted(unknown)}.")
+    return robot_ids
 
 
-def main():
-    # Start the video capture and shared resources update in a separate thread
-    capture_thread = threading.Thread(
-        target=capture_and_update_shared_resources,
-        # args=("http://127.0.0.1:5000/video_feed",),
-        args=("http://192.168.1.185:8080/video",),
-        daemon=True,
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Detect the arena's markers and drive the robots, in one process "
+        "or split across a vision node and controller nodes."
     )
-    capture_thread.start()
+    parser.add_argument(
+        "--role",
+        choices=["all", "vision", "controller"],
+        default=NODE_ROLE,
+        help="vision publishes marker tables, controller drives robots from them",
+    )
+    parser.add_argument(
+        "--robots",
+        type=parse_robot_ids,
+        default=ROBOT_IDS,
+        help="comma separated robot IDs this node drives (default: all)",
+    )
+    parser.add_argument("--broker", default=MQTT_BROKER)
+    return parser.parse_args()
 
-    # Start a thread for each robot
-    robot_threads = [
-        threading.Thread(target=robot_control_loop, args=(robot_id,), daemon=True)
-        for robot_id in ROBOT_IDS
-    ]
-    for thread in robot_threads:
+
+def main():
+    global NODE_ROLE, MQTT_BROKER
+    args = parse_args()
+    NODE_ROLE = args.role
+    MQTT_BROKER = args.broker
+
+    load_detector_profile()
+    start_telemetry()
+
+    # Capture and detect from every camera in parallel, one thread each
+    capture_threads = []
+    if NODE_ROLE != "controller":
+        capture_threads = [
+            threading.Thread(
+                target=capture_and_update_shared_resources,
+                args=(camera["url"], camera_index, camera["reference_markers"]),
+                daemon=True,
+            )
+            for camera_index, camera in enumerate(CAMERAS)
+        ]
+    for thread in capture_threads:
         thread.start()
 
+    if NODE_ROLE == "vision":
+        # No robot threads to connect for us
+        connect_mqtt()
+    else:
+        # Start a thread for each robot this node drives
+        robot_threads = [
+            threading.Thread(target=robot_control_loop, args=(robot_id,), daemon=True)
+            for robot_id in args.robots
+        ]
+        for thread in robot_threads:
+            thread.start()
+
+        # A single controller thread drives every robot
+        control_thread = threading.Thread(target=control_loop, daemon=True)
+        control_thread.start()
+
+        # Link health monitor, whose latency estimates feed the controller
+        link_thread = threading.Thread(
+            target=link_monitor_loop, args=(args.robots,), daemon=True
+        )
+        link_thread.start()
+
+    if NODE_ROLE == "controller":
+        threading.Thread(target=marker_table_loop, daemon=True).start()
+
+        # Controller nodes have no camera; run until the robot threads exit
+        for thread in robot_threads:
+            thread.join()
+        return
+
     # Visualization thread
     visualization_thread = threading.Thread(
         target=visualize_robot_behavior, daemon=True
     )
     visualization_thread.start()
 
-    # Wait for the capture thread to finish
-    capture_thread.join()
+    # Wait for the capture threads to finish
+    for thread in capture_threads:
+        thread.join()
 
     # Threads are daemon threads, so they will exit when the main thread exits
     # Ensure all windows are closed properly